@@ -0,0 +1,231 @@
+"""
+Analytics over the recorded responses.
+
+The CSV written by ResponseRecorder is loaded once into columnar NumPy arrays; every view (per
+contrast, per session, per child) is then computed with vectorized operations over the whole table,
+so that the dialog stays interactive with hundreds of thousands of responses.
+"""
+
+# pylint: disable = no-name-in-module, invalid-name
+
+import csv
+from pathlib import Path
+
+import numpy as np
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+                               QTableWidget, QTableWidgetItem, QDialogButtonBox, QHeaderView)
+
+
+class ResponseTable:
+    """Recorded responses as columns.
+    Text columns are encoded as integer codes into sorted label arrays (children, sessions,
+    categories) so that grouping is a matter of np.bincount."""
+
+    def __init__(self, columns: dict):
+        """Init from a dict of column name -> list of strings, as read from the CSV."""
+        self.size = len(columns["correct"])
+        self.children, self.child = np.unique(np.array(columns["child"], dtype=str),
+                                              return_inverse=True)
+        # Session labels start with a timestamp: sorting them sorts the sessions in time.
+        self.sessions, self.session = np.unique(np.array(columns["session"], dtype=str),
+                                                return_inverse=True)
+        self.categories, self.category = np.unique(np.array(columns["category"], dtype=str),
+                                                   return_inverse=True)
+        self.correct_side = np.array(columns["correct_side"], dtype=np.int8)
+        self.selected_side = np.array(columns["selected_side"], dtype=np.int8)
+        self.correct = np.array(columns["correct"], dtype=np.int8).astype(bool)
+        self.response_time = np.array(columns["response_time"], dtype=np.float64)
+
+    @classmethod
+    def load(cls, file_path) -> "ResponseTable":
+        """Read the CSV file. A missing file gives an empty table."""
+        columns = {"child": [], "session": [], "category": [], "correct_side": [],
+                   "selected_side": [], "correct": [], "response_time": []}
+        if Path(file_path).is_file():
+            with open(file_path, "r", encoding="utf-8", newline="") as file:
+                reader = csv.reader(file)
+                header = next(reader, [])
+                indexes = [header.index(name) for name in columns]
+                rows = list(reader)
+            for name, index in zip(columns, indexes):
+                columns[name] = [row[index] for row in rows]
+        return cls(columns)
+
+    def mask_for_child(self, child: str = None) -> np.ndarray:
+        """Boolean mask of the responses of a child, or of all responses."""
+        if child is None:
+            return np.ones(self.size, dtype=bool)
+        index = np.searchsorted(self.children, child)
+        if index >= len(self.children) or self.children[index] != child:
+            return np.zeros(self.size, dtype=bool)
+        return self.child == index
+
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray, group_count: int,
+                        percentiles) -> np.ndarray:
+    """Percentiles of values within each group, all groups at once.
+    Returns an array (group_count, len(percentiles)), NaN for empty groups."""
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    result = np.full((group_count, len(percentiles)), np.nan)
+    filled = counts > 0
+    for column, percentile in enumerate(percentiles):
+        # Linear interpolation between the closest ranks, like np.percentile.
+        rank = (counts[filled] - 1) * percentile / 100
+        low = np.floor(rank).astype(np.int64)
+        high = np.ceil(rank).astype(np.int64)
+        fraction = rank - low
+        low_values = sorted_values[starts[filled] + low]
+        high_values = sorted_values[starts[filled] + high]
+        result[filled, column] = low_values + (high_values - low_values) * fraction
+    return result
+
+
+def contrast_summary(table: ResponseTable, mask: np.ndarray) -> dict:
+    """Per contrast (category): number of answers, accuracy, 2x2 confusion matrix
+    [asked side, clicked side] and response time percentiles (50, 90)."""
+    category_count = len(table.categories)
+    category = table.category[mask]
+
+    answers = np.bincount(category, minlength=category_count)
+    correct = np.bincount(category, weights=table.correct[mask], minlength=category_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        accuracy = correct / answers
+
+    cells = category * 4 + table.correct_side[mask] * 2 + table.selected_side[mask]
+    confusion = np.bincount(cells, minlength=category_count * 4).reshape(category_count, 2, 2)
+
+    latency = grouped_percentiles(category, table.response_time[mask], category_count, (50, 90))
+    return {"answers": answers, "accuracy": accuracy, "confusion": confusion,
+            "latency": latency}
+
+
+def session_accuracy(table: ResponseTable, mask: np.ndarray) -> np.ndarray:
+    """Accuracy per (session, contrast), NaN where nothing was answered.
+    Sessions are in time order, as in table.sessions."""
+    shape = (len(table.sessions), len(table.categories))
+    cells = table.session[mask] * shape[1] + table.category[mask]
+    answers = np.bincount(cells, minlength=shape[0] * shape[1])
+    correct = np.bincount(cells, weights=table.correct[mask], minlength=shape[0] * shape[1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (correct / answers).reshape(shape)
+
+
+def session_latency(table: ResponseTable, mask: np.ndarray, percentiles=(50, 90)) -> np.ndarray:
+    """Response time percentiles per (session, contrast), NaN where nothing was answered.
+    Returns an array (sessions, contrasts, len(percentiles))."""
+    shape = (len(table.sessions), len(table.categories))
+    cells = table.session[mask] * shape[1] + table.category[mask]
+    latency = grouped_percentiles(cells, table.response_time[mask], shape[0] * shape[1],
+                                  percentiles)
+    return latency.reshape(shape + (len(percentiles),))
+
+
+def session_label(session: str) -> str:
+    """Session key without its random suffix, for display."""
+    return session.rsplit(" ", 1)[0] if "#" in session else session
+
+
+class AnalyticsDialog(QDialog):
+    """Shows the summary per contrast, and the accuracy and response time across sessions, for one
+    child or all."""
+
+    ALL_CHILDREN = "Tous les enfants"
+
+    def __init__(self, file_path, parent=None):
+        """Init."""
+        super().__init__(parent)
+        self.table = ResponseTable.load(file_path)
+        self.child_combo = None
+        self.contrast_table = None
+        self.session_table = None
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        """Initializes the user interface of the dialog."""
+
+        self.setWindowTitle("Statistiques")
+        self.resize(900, 600)
+        layout = QVBoxLayout()
+
+        # Child selection.
+        child_layout = QHBoxLayout()
+        child_layout.addWidget(QLabel("Enfant :"))
+        self.child_combo = QComboBox()
+        self.child_combo.addItem(self.ALL_CHILDREN)
+        self.child_combo.addItems([child for child in self.table.children.tolist() if child])
+        self.child_combo.currentTextChanged.connect(self.refresh)
+        child_layout.addWidget(self.child_combo)
+        child_layout.addStretch()
+        layout.addLayout(child_layout)
+
+        # Summary per contrast.
+        layout.addWidget(QLabel("Par contraste"))
+        self.contrast_table = QTableWidget()
+        self.contrast_table.setColumnCount(7)
+        self.contrast_table.setHorizontalHeaderLabels(
+            ["Contraste", "Réponses", "Réussite", "Confusion 1 → 2", "Confusion 2 → 1",
+             "Temps médian", "Temps 90 %"])
+        self.contrast_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.contrast_table)
+
+        # Accuracy and response time across sessions.
+        layout.addWidget(QLabel("Réussite et temps médian par séance"))
+        self.session_table = QTableWidget()
+        layout.addWidget(self.session_table)
+
+        # Create action buttons.
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok)
+        button_box.accepted.connect(self.accept)
+        layout.addWidget(button_box)
+
+        self.setLayout(layout)
+
+    def refresh(self):
+        """Recompute the tables for the selected child."""
+        child = self.child_combo.currentText()
+        mask = self.table.mask_for_child(None if child == self.ALL_CHILDREN else child)
+
+        summary = contrast_summary(self.table, mask)
+        shown = np.flatnonzero(summary["answers"])
+        self.contrast_table.setRowCount(len(shown))
+        for row, index in enumerate(shown):
+            sides = self.table.categories[index].split("_")
+            confusion = summary["confusion"][index]
+            cells = [" / ".join(sides),
+                     str(summary["answers"][index]),
+                     f"{summary['accuracy'][index]:.0%}",
+                     # Asked the first sound, clicked the second one, and the other way round.
+                     f"{sides[0]} → {sides[-1]} : {confusion[0, 1]}",
+                     f"{sides[-1]} → {sides[0]} : {confusion[1, 0]}",
+                     f"{summary['latency'][index, 0]:.1f} s",
+                     f"{summary['latency'][index, 1]:.1f} s"]
+            for column, text in enumerate(cells):
+                self.contrast_table.setItem(row, column, QTableWidgetItem(text))
+
+        accuracy = session_accuracy(self.table, mask)
+        latency = session_latency(self.table, mask)
+        sessions = np.flatnonzero(~np.all(np.isnan(accuracy), axis=1))
+        self.session_table.setRowCount(len(sessions))
+        self.session_table.setColumnCount(len(shown))
+        self.session_table.setHorizontalHeaderLabels(
+            [self.table.categories[index].replace("_", " / ") for index in shown])
+        self.session_table.setVerticalHeaderLabels(
+            [session_label(str(self.table.sessions[index])) for index in sessions])
+        for row, session in enumerate(sessions):
+            for column, index in enumerate(shown):
+                value = accuracy[session, index]
+                item = QTableWidgetItem()
+                if not np.isnan(value):
+                    median, slow = latency[session, index]
+                    item.setText(f"{value:.0%} · {median:.1f} s")
+                    item.setToolTip(f"Temps médian {median:.1f} s, temps 90 % {slow:.1f} s")
+                self.session_table.setItem(row, column, item)
+
+    def show(self):
+        """Displays the modal dialog."""
+        self.exec()
@@ -0,0 +1,91 @@
+"""
+Asset cache.
+
+Decoded images and sounds are shared by all the practice windows of the process. Each window
+acquires the assets it shows or may play and releases them when it moves on, so that memory grows
+with the number of distinct assets in use, not with the number of windows.
+"""
+
+from pathlib import Path
+
+
+class AssetCache:
+    """Reference-counted cache of decoded assets, keyed by (kind, path).
+    A loader is registered for each kind ("image", "sound"): loader(path) -> decoded value.
+    An entry is freed when its last reference is released."""
+
+    def __init__(self):
+        """Init."""
+        self.loaders = {}
+        self.entries = {}  # (kind, path) -> [value, reference count]
+        self.hits = 0
+        self.misses = 0
+
+    def register_loader(self, kind: str, loader):
+        """Set the function decoding the assets of the given kind."""
+        self.loaders[kind] = loader
+
+    def acquire(self, kind: str, path: Path):
+        """Return the decoded asset, loading it on first use, and take a reference on it."""
+        key = (kind, str(path))
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = [self.loaders[kind](path), 0]
+            self.entries[key] = entry
+        else:
+            self.hits += 1
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, kind: str, path: Path):
+        """Drop a reference taken by acquire(). Unknown assets are ignored."""
+        key = (kind, str(path))
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.entries[key]
+
+    def invalidate(self, kind: str, path: Path) -> bool:
+        """The file of an asset changed: decode it again if someone holds it, the references
+        being kept. A removed file keeps its last decoded value. Returns whether it was held."""
+        entry = self.entries.get((kind, str(path)))
+        if entry is None:
+            return False
+        if Path(path).is_file():
+            entry[0] = self.loaders[kind](path)
+        return True
+
+    def get(self, kind: str, path: Path):
+        """Return the decoded asset if someone holds it, else None. No reference is taken."""
+        entry = self.entries.get((kind, str(path)))
+        return entry[0] if entry is not None else None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class AssetSet:
+    """The assets held by one user of the cache (a window, an item).
+    Replacing the set releases what is no longer needed before acquiring the new assets, so that
+    assets kept from one item to the next are not reloaded."""
+
+    def __init__(self, cache: AssetCache):
+        """Init."""
+        self.cache = cache
+        self.held = set()
+
+    def replace(self, assets: set):
+        """Hold exactly the given (kind, path) assets."""
+        assets = {(kind, str(path)) for kind, path in assets}
+        for kind, path in assets - self.held:
+            self.cache.acquire(kind, path)
+        for kind, path in self.held - assets:
+            self.cache.release(kind, path)
+        self.held = assets
+
+    def clear(self):
+        """Release everything."""
+        self.replace(set())
@@ -0,0 +1,226 @@
+"""
+Thumbnail atlases.
+
+One image per category holds the thumbnails of all the pictures of its pairs, with a JSON index of
+where each word is. The category overview then costs one decode and a few sub-rect draws instead
+of decoding every 2500x2500 source. Atlases are built lazily and cached on disk, and rebuilt when
+a source image changes; they can also be built offline:
+
+    python atlas.py
+"""
+
+# pylint: disable = no-name-in-module, invalid-name
+
+import argparse
+import hashlib
+import importlib.resources
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PySide6.QtCore import Qt, QPoint, QRect, QSize, Signal
+from PySide6.QtGui import QImage, QImageReader, QPainter, QPixmap, QColor
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QWidget, QSizePolicy
+
+from pairs import pairs
+
+
+# The data package, found like PathManager does: in the frozen build, __file__ is in the library
+# archive and the data next to it. Joining an existing child gives a concrete path.
+DATA_DIR = (importlib.resources.files("data") / "images").parent
+THUMB_SIZE = 256
+# Thumbnails per row of the atlas: two pairs per row.
+COLUMNS = 4
+
+
+def image_path(word: str, data_dir: Path = DATA_DIR) -> Path:
+    """Source image of a word."""
+    return data_dir / "images" / f"{word}.png"
+
+
+def atlas_key(word_pairs: list, thumb_size: int, data_dir: Path = DATA_DIR) -> str:
+    """Identifies the content of an atlas: its words, the thumbnail size and the size and date
+    of each source image. Only the sources are stat'ed, not read. The words are sorted: the
+    index maps each word to its thumbnail, so the same pairs in another order (e.g. sorted by
+    difficulty) use the same atlas."""
+    words = sorted({word for pair in word_pairs for word in pair})
+    digest = hashlib.sha1(f"{words}|{thumb_size}".encode("utf-8"))
+    for word in words:
+        path = image_path(word, data_dir)
+        if path.is_file():
+            stat = path.stat()
+            digest.update(f"{word}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_atlas(word_pairs: list, thumb_size: int = THUMB_SIZE,
+                data_dir: Path = DATA_DIR) -> tuple:
+    """Draw the thumbnails of the pairs in a grid. Returns (image, index) where the index maps
+    each word to its [x, y, width, height] in the atlas."""
+    words = [word for pair in word_pairs for word in pair]
+    rows = (len(words) + COLUMNS - 1) // COLUMNS
+    atlas = QImage(COLUMNS * thumb_size, max(1, rows) * thumb_size, QImage.Format_ARGB32)
+    atlas.fill(Qt.white)
+
+    index = {}
+    painter = QPainter(atlas)
+    for position, word in enumerate(words):
+        x = position % COLUMNS * thumb_size
+        y = position // COLUMNS * thumb_size
+        reader = QImageReader(str(image_path(word, data_dir)))
+        source_size = reader.size()
+        if source_size.isValid():
+            # Let the decoder scale while reading when it can.
+            reader.setScaledSize(source_size.scaled(thumb_size, thumb_size, Qt.KeepAspectRatio))
+        thumbnail = reader.read()
+        if not thumbnail.isNull():
+            thumbnail = thumbnail.scaled(thumb_size, thumb_size, Qt.KeepAspectRatio,
+                                         Qt.SmoothTransformation)
+            # Centered in its cell.
+            painter.drawImage(x + (thumb_size - thumbnail.width()) // 2,
+                              y + (thumb_size - thumbnail.height()) // 2, thumbnail)
+        index[word] = [x, y, thumb_size, thumb_size]
+    painter.end()
+    return atlas, index
+
+
+def load_atlas(label: str, word_pairs: list, cache_dir: Path, thumb_size: int = THUMB_SIZE,
+               data_dir: Path = DATA_DIR) -> tuple:
+    """Atlas of a category from the cache, built and cached first if missing or outdated.
+    Returns (path of the atlas image, index)."""
+    key = atlas_key(word_pairs, thumb_size, data_dir)
+    image_file = cache_dir / f"{label}.png"
+    index_file = cache_dir / f"{label}.json"
+    if image_file.is_file() and index_file.is_file():
+        with open(index_file, "r", encoding="utf-8") as file:
+            cached = json.load(file)
+        if cached.get("key") == key:
+            return image_file, cached["words"]
+
+    atlas, index = build_atlas(word_pairs, thumb_size, data_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    atlas.save(str(image_file), "PNG")
+    with open(index_file, "w", encoding="utf-8") as file:
+        json.dump({"key": key, "thumb_size": thumb_size, "words": index}, file,
+                  ensure_ascii=False)
+    return image_file, index
+
+
+def invalidate(label: str, cache_dir: Path):
+    """Remove the cached atlas of a category."""
+    for suffix in (".png", ".json"):
+        (cache_dir / f"{label}{suffix}").unlink(missing_ok=True)
+
+
+class AtlasView(QWidget):
+    """Grid of the pairs of a category, drawn from the atlas: one row per pair, the two pictures
+    side by side with their words. Emits pairClicked(row) when a pair is clicked."""
+
+    pairClicked = Signal(int)
+
+    def __init__(self, atlas: QPixmap, index: dict, word_pairs: list, parent=None):
+        """Init."""
+        super().__init__(parent)
+        self.atlas = atlas
+        self.index = index
+        self.word_pairs = word_pairs
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumSize(400, 300)
+
+    def grid(self) -> tuple:
+        """(columns of pairs, rows, cell size) fitting the widget, with square cells."""
+        count = max(1, len(self.word_pairs))
+        best = (1, count, 0)
+        for columns in range(1, count + 1):
+            rows = (count + columns - 1) // columns
+            cell = min(self.width() // (columns * 2), self.height() // rows)
+            if cell > best[2]:
+                best = (columns, rows, cell)
+        return best
+
+    def pair_rects(self, row: int) -> tuple:
+        """Rectangles of the two pictures of a pair in the widget."""
+        columns, _, cell = self.grid()
+        x = row % columns * 2 * cell
+        y = row // columns * cell
+        return QRect(x, y, cell, cell), QRect(x + cell, y, cell, cell)
+
+    def paintEvent(self, event):
+        """Draw each picture from its sub-rect of the atlas."""
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for row, pair in enumerate(self.word_pairs):
+            for rect, word in zip(self.pair_rects(row), pair):
+                space = rect.adjusted(4, 4, -4, -20)
+                if word in self.index:
+                    x, y, width, height = self.index[word]
+                    # Centered above the word, keeping the aspect ratio of the thumbnail.
+                    target = QRect(QPoint(), QSize(width, height).scaled(space.size(),
+                                                                         Qt.KeepAspectRatio))
+                    target.moveCenter(space.center())
+                    painter.drawPixmap(target, self.atlas, QRect(x, y, width, height))
+                painter.drawText(rect.adjusted(0, rect.height() - 20, 0, 0),
+                                 Qt.AlignCenter, word)
+            # Frame around the pair.
+            first, second = self.pair_rects(row)
+            painter.setPen(QColor("#bbbbbb"))
+            painter.drawRect(first.united(second).adjusted(1, 1, -2, -2))
+            painter.setPen(QColor("black"))
+        painter.end()
+
+    def mousePressEvent(self, event):
+        """Emit the row of the clicked pair."""
+        for row in range(len(self.word_pairs)):
+            first, second = self.pair_rects(row)
+            if first.united(second).contains(event.position().toPoint()):
+                self.pairClicked.emit(row)
+                return
+
+
+class CategoryOverviewDialog(QDialog):
+    """Shows all the pairs of a category at once. Clicking a pair closes the dialog;
+    selected_row is then the row of the pair."""
+
+    def __init__(self, label: str, word_pairs: list, cache_dir: Path, parent=None):
+        """Init."""
+        super().__init__(parent)
+        self.selected_row = None
+        atlas_file, index = load_atlas(label, word_pairs, cache_dir)
+
+        self.setWindowTitle(f"Aperçu : {label.replace('_', ' / ')}")
+        self.resize(900, 700)
+        layout = QVBoxLayout()
+        view = AtlasView(QPixmap(str(atlas_file)), index, word_pairs, self)
+        view.pairClicked.connect(self.select_pair)
+        layout.addWidget(view)
+        self.setLayout(layout)
+
+    def select_pair(self, row: int):
+        """A pair was clicked."""
+        self.selected_row = row
+        self.accept()
+
+
+def build_category(label: str, word_pairs: list, cache_dir: str) -> str:
+    """Build the atlas of one category, in a worker process."""
+    load_atlas(label, word_pairs, Path(cache_dir))
+    return label
+
+
+def main(argv=None):
+    """Build the atlases of every category ahead of time, on all cores."""
+    parser = argparse.ArgumentParser(description="Build the thumbnail atlases.")
+    parser.add_argument("--cache-dir", default=str(Path("cache") / "atlas"))
+    args = parser.parse_args(argv)
+
+    with ProcessPoolExecutor() as executor:
+        labels = [category[0] for category in pairs]
+        word_pairs = [category[1:] for category in pairs]
+        for label in executor.map(build_category, labels, word_pairs,
+                                  [args.cache_dir] * len(labels)):
+            print(f"{label}: {Path(args.cache_dir) / label}.png")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+Audio output backends.
+
+- SoundEffectBackend: QSoundEffect, the historical backend. Simple, but no control over buffering.
+- SinkBackend: QAudioSink fed with preloaded PCM through a small, configurable buffer, for a
+  shorter delay between a click and the word being heard.
+- NullBackend: no audio device, optionally writes what would be played to a WAV file. For
+  headless runs and tests.
+
+A LatencyProbe can be attached to any backend to measure click-to-sound latency, and an
+AudioConverter (audio_convert.py) to play the sounds converted to the format of the device:
+
+    python audio.py --backend sink --buffer-ms 10 --count 50 --native
+"""
+
+import argparse
+import sys
+import time
+import wave
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication, QTimer, QUrl
+from PySide6.QtMultimedia import QAudioFormat, QAudioSink, QMediaDevices, QSoundEffect
+
+
+class PcmClip:
+    """Decoded content of a WAV file."""
+
+    def __init__(self, sample_rate: int, channels: int, sample_width: int, data: bytes):
+        """Init."""
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.data = data
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return len(self.data) / (self.sample_rate * self.channels * self.sample_width)
+
+    def bytes_for(self, milliseconds: float) -> int:
+        """Number of bytes for the given duration, aligned on a frame."""
+        frame_size = self.channels * self.sample_width
+        return max(1, int(self.sample_rate * milliseconds / 1000)) * frame_size
+
+
+def load_pcm(file: Path) -> PcmClip:
+    """Read a WAV file into memory. 24-bit samples are converted to 32-bit ones."""
+    with wave.open(str(file), "rb") as wav:
+        sample_width = wav.getsampwidth()
+        data = wav.readframes(wav.getnframes())
+        if sample_width == 3:
+            # No 24-bit sample format in QAudioFormat: widened to 32 bits, the low byte zero.
+            widened = bytearray(len(data) // 3 * 4)
+            for byte in range(3):
+                widened[byte + 1::4] = data[byte:len(data) - len(data) % 3:3]
+            data, sample_width = bytes(widened), 4
+        return PcmClip(wav.getframerate(), wav.getnchannels(), sample_width, data)
+
+
+class LatencyProbe:
+    """Timestamps input events and the first write of the following sound, and keeps the
+    differences."""
+
+    def __init__(self, clock=time.perf_counter):
+        """Init."""
+        self.clock = clock
+        self.input_time = None
+        self.samples = []
+
+    def mark_input(self):
+        """An input event was received. The last one before a sound is the one that counts."""
+        self.input_time = self.clock()
+
+    def mark_first_write(self):
+        """The first buffer of a sound was handed to the output."""
+        if self.input_time is not None:
+            self.samples.append(self.clock() - self.input_time)
+            self.input_time = None
+
+    def histogram(self, bin_ms: float = 5) -> list:
+        """Return (lower bound in ms, count) bins."""
+        bins = {}
+        for sample in self.samples:
+            lower = int(sample * 1000 // bin_ms * bin_ms)
+            bins[lower] = bins.get(lower, 0) + 1
+        return sorted(bins.items())
+
+    def report(self, bin_ms: float = 5) -> str:
+        """Latency histogram as text."""
+        if not self.samples:
+            return "No latency measured."
+        samples = sorted(self.samples)
+        median = samples[len(samples) // 2] * 1000
+        lines = [f"Click-to-sound latency, {len(samples)} samples: "
+                 f"min {samples[0] * 1000:.1f} ms, median {median:.1f} ms, "
+                 f"max {samples[-1] * 1000:.1f} ms"]
+        top = max(count for _, count in self.histogram(bin_ms))
+        for lower, count in self.histogram(bin_ms):
+            bar = "#" * max(1, round(40 * count / top))
+            lines.append(f"{lower:5d}-{lower + bin_ms:<5g} ms {count:5d} {bar}")
+        return "\n".join(lines)
+
+
+class AudioBackend:
+    """Common interface of the audio backends.
+    Backends playing PCM take the clips from the converter when it has them ready in the format of
+    the device, else from the shared AssetCache ("sound" kind) when the caller holds them there,
+    else they keep their own copy."""
+
+    # Seconds to sleep between two checks of is_playing() while waiting for a sound to end.
+    poll_interval = 0.1
+    # Whether the backend plays decoded PCM, so that sounds are worth holding in the cache.
+    uses_pcm = False
+
+    def __init__(self, probe: LatencyProbe = None, cache=None, converter=None):
+        """Init."""
+        self.probe = probe
+        self.cache = cache
+        self.converter = converter
+        self.clips = {}
+
+    def load_clip(self, file: Path) -> PcmClip:
+        """Decoded clip of a sound file."""
+        if self.converter is not None:
+            clip = self.converter.converted_clip(file)
+            if clip is not None:
+                return clip
+        if self.cache is not None:
+            clip = self.cache.get("sound", file)
+            # Not held by anyone: decode it for this time only.
+            return clip if clip is not None else load_pcm(file)
+        key = str(file)
+        if key not in self.clips:
+            self.clips[key] = load_pcm(file)
+        return self.clips[key]
+
+    def play(self, file: Path):
+        """Start playing a sound file. Returns immediately."""
+        raise NotImplementedError
+
+    def is_playing(self) -> bool:
+        """True until the sound has been heard entirely."""
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop the sound being played."""
+
+    def first_write(self):
+        """To be called when the first buffer of a sound reaches the output."""
+        if self.probe is not None:
+            self.probe.mark_first_write()
+
+
+class SoundEffectBackend(AudioBackend):
+    """QSoundEffect backend. The buffer is managed by Qt, so the first write is approximated by
+    the moment the effect starts playing."""
+
+    def __init__(self, probe: LatencyProbe = None, cache=None, converter=None):
+        """Init."""
+        super().__init__(probe, cache, converter)
+        self.current_sound = QSoundEffect()
+        # Whether the current effect has not started yet.
+        self.starting = False
+
+    def play(self, file: Path):
+        """Start playing a sound file, or its conversion to the format of the device."""
+        if self.converter is not None:
+            file = self.converter.converted_path(file) or file
+        # Reinit sound an set source file.
+        self.stop_waiting_start()
+        self.current_sound = QSoundEffect()
+        self.current_sound.playingChanged.connect(self.on_playing_changed)
+        self.starting = True
+        self.current_sound.setSource(QUrl.fromLocalFile(file))
+        # Start playing the sound.
+        self.current_sound.setVolume(1)
+        self.current_sound.play()
+
+    def on_playing_changed(self):
+        """The effect started or ended: only its start counts as the first write."""
+        if self.starting and self.current_sound.isPlaying():
+            self.stop_waiting_start()
+            self.first_write()
+
+    def stop_waiting_start(self):
+        """Stop listening to the effect, once started or replaced."""
+        if self.starting:
+            self.current_sound.playingChanged.disconnect(self.on_playing_changed)
+            self.starting = False
+
+    def is_playing(self) -> bool:
+        """True while the effect plays."""
+        return self.current_sound.isPlaying()
+
+    def stop(self):
+        """Stop the effect."""
+        self.current_sound.stop()
+
+
+class SinkBackend(AudioBackend):
+    """QAudioSink backend in push mode. Clips are decoded once and kept in memory; the first
+    buffer is written synchronously in play(), the rest is fed by a timer."""
+
+    poll_interval = 0.005
+    uses_pcm = True
+
+    def __init__(self, buffer_ms: float = 20, device=None, probe: LatencyProbe = None,
+                 cache=None, converter=None):
+        """Init."""
+        super().__init__(probe, cache, converter)
+        self.buffer_ms = buffer_ms
+        self.device = device if device is not None else QMediaDevices.defaultAudioOutput()
+        self.sink = None
+        self.sink_key = None
+        self.io = None
+        self.clip = None
+        self.position = 0
+
+        self.feed_timer = QTimer()
+        self.feed_timer.setInterval(max(1, int(self.buffer_ms / 4)))
+        self.feed_timer.timeout.connect(self.feed)
+
+    def open_sink(self, clip: PcmClip):
+        """Create the sink, or reuse it if the previous clip had the same format."""
+        key = (clip.sample_rate, clip.channels, clip.sample_width)
+        if self.sink is not None and self.sink_key == key:
+            self.sink.stop()
+            return
+
+        if self.sink is not None:
+            self.sink.stop()
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(clip.sample_rate)
+        audio_format.setChannelCount(clip.channels)
+        audio_format.setSampleFormat({1: QAudioFormat.SampleFormat.UInt8,
+                                      2: QAudioFormat.SampleFormat.Int16,
+                                      4: QAudioFormat.SampleFormat.Int32}[clip.sample_width])
+        self.sink = QAudioSink(self.device, audio_format)
+        self.sink.setBufferSize(clip.bytes_for(self.buffer_ms))
+        self.sink_key = key
+
+    def play(self, file: Path):
+        """Start playing a sound file."""
+        self.clip = self.load_clip(file)
+        self.position = 0
+        self.open_sink(self.clip)
+        self.io = self.sink.start()
+        self.feed()
+        self.first_write()
+        self.feed_timer.start()
+
+    def feed(self):
+        """Write as much of the clip as the sink buffer accepts."""
+        if self.clip is None:
+            return
+        free = self.sink.bytesFree()
+        if free > 0 and self.position < len(self.clip.data):
+            chunk = self.clip.data[self.position:self.position + free]
+            self.position += self.io.write(chunk)
+        if self.position >= len(self.clip.data):
+            self.feed_timer.stop()
+
+    def is_playing(self) -> bool:
+        """True while data remains to be written or the sink buffer is not drained yet."""
+        if self.clip is None:
+            return False
+        if self.position < len(self.clip.data):
+            return True
+        return self.sink.bytesFree() < self.sink.bufferSize()
+
+    def stop(self):
+        """Stop the sound and drop what remains of it."""
+        self.feed_timer.stop()
+        self.clip = None
+        if self.sink is not None:
+            self.sink.stop()
+
+
+class NullBackend(AudioBackend):
+    """Backend without audio device.
+    realtime: is_playing() stays True for the duration of the clip, else sounds end at once.
+    output_path: the clips are appended to this WAV file, as a file sink."""
+
+    poll_interval = 0.005
+    uses_pcm = True
+
+    def __init__(self, realtime: bool = False, output_path: Path = None,
+                 probe: LatencyProbe = None, cache=None, clock=time.monotonic, converter=None):
+        """Init."""
+        super().__init__(probe, cache, converter)
+        self.realtime = realtime
+        self.clock = clock
+        self.ends_at = 0.0
+        self.played = 0
+        self.output = None
+        self.output_format = None
+        if output_path is not None:
+            self.output = wave.open(str(output_path), "wb")
+
+    def play(self, file: Path):
+        """Pretend to play a sound file."""
+        clip = self.load_clip(file)
+
+        if self.output is not None:
+            clip_format = (clip.channels, clip.sample_width, clip.sample_rate)
+            if self.output_format is None:
+                self.output.setnchannels(clip.channels)
+                self.output.setsampwidth(clip.sample_width)
+                self.output.setframerate(clip.sample_rate)
+                self.output_format = clip_format
+            # A WAV file has one format: other clips are skipped.
+            if clip_format == self.output_format:
+                self.output.writeframes(clip.data)
+        self.first_write()
+
+        self.played += 1
+        self.ends_at = self.clock() + (clip.duration if self.realtime else 0.0)
+
+    def is_playing(self) -> bool:
+        """True until the clip duration has elapsed, in realtime mode."""
+        return self.clock() < self.ends_at
+
+    def stop(self):
+        """Stop pretending."""
+        self.ends_at = 0.0
+
+    def close(self):
+        """Finish the output file."""
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+
+def create_backend(name: str, buffer_ms: float = 20, probe: LatencyProbe = None,
+                   cache=None, converter=None) -> AudioBackend:
+    """Create a backend from its option name: "soundeffect", "sink" or "null"."""
+    if name == "sink":
+        return SinkBackend(buffer_ms=buffer_ms, probe=probe, cache=cache, converter=converter)
+    if name == "null":
+        return NullBackend(probe=probe, cache=cache, converter=converter)
+    return SoundEffectBackend(probe=probe, cache=cache, converter=converter)
+
+
+def main(argv=None):
+    """Measure the latency of a backend: simulated clicks on "Listen" with the corpus sounds."""
+    parser = argparse.ArgumentParser(description="Measure click-to-sound latency.")
+    parser.add_argument("--backend", default="sink", choices=["soundeffect", "sink", "null"])
+    parser.add_argument("--buffer-ms", type=float, default=20)
+    parser.add_argument("--count", type=int, default=20, help="number of sounds to play")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="with the null backend, write the sounds to this WAV file")
+    parser.add_argument("--native", action="store_true",
+                        help="play the sounds converted to the format of the device")
+    args = parser.parse_args(argv)
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    probe = LatencyProbe()
+    sounds_dir = Path(__file__).parent / "data" / "sounds"
+    files = sorted(sounds_dir.glob("*.wav"))[:args.count]
+
+    converter = None
+    if args.native:
+        # pylint: disable = import-outside-toplevel, cyclic-import
+        from audio_convert import AudioConverter
+        converter = AudioConverter.for_device(Path("cache") / "audio")
+        if converter is None:
+            print("Format of the output device unknown: sounds played as they are.")
+        else:
+            converter.prepare(files)
+            converter.wait()
+            print(f"Sounds converted to {converter.target.key}.")
+
+    if args.backend == "null":
+        backend = NullBackend(realtime=args.output is None, output_path=args.output, probe=probe,
+                              converter=converter)
+    else:
+        backend = create_backend(args.backend, args.buffer_ms, probe, converter=converter)
+
+    for file in files:
+        probe.mark_input()
+        backend.play(file)
+        while backend.is_playing():
+            app.processEvents()
+            time.sleep(backend.poll_interval)
+    if isinstance(backend, NullBackend):
+        backend.close()
+
+    print(probe.report())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
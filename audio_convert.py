@@ -0,0 +1,271 @@
+"""
+Conversion of the sounds to the format of the audio output.
+
+The clips are 44.1 kHz mono while many outputs run at 48 kHz stereo, so the audio stack resamples
+and upmixes every clip when it starts, which delays it on weak machines. The format preferred by
+the output device is read once at startup, and the sounds which may be played soon (the prompts,
+the success sounds, the words of the active categories) are converted ahead of time by a
+background thread, with NumPy: linear interpolation for the sample rate, after a low-pass filter
+when it is lowered, averaging and copying for the channels.
+
+Conversions are cached on disk in cache/audio/, keyed by the content of the source and the target
+format, so they are done once per machine, and in memory for the sounds in use when the backend
+plays decoded PCM. Sounds are kept as integer PCM WAV files: a device preferring floating point
+samples gets 16-bit ones, the conversion of the sample type being cheap next to resampling.
+"""
+
+# pylint: disable = no-name-in-module
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PySide6.QtMultimedia import QAudioFormat, QMediaDevices
+
+from audio import PcmClip, load_pcm
+
+
+class TargetFormat:
+    """Sample rate, channel count and sample width (bytes) of converted sounds."""
+
+    def __init__(self, sample_rate: int, channels: int, sample_width: int = 2):
+        """Init."""
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    @property
+    def key(self) -> str:
+        """Name of the format in the cache file names."""
+        return f"{self.sample_rate}Hz_{self.channels}ch_{8 * self.sample_width}bit"
+
+    def matches(self, clip: PcmClip) -> bool:
+        """Whether a clip is in this format already."""
+        return (clip.sample_rate, clip.channels, clip.sample_width) == \
+            (self.sample_rate, self.channels, self.sample_width)
+
+    def __repr__(self):
+        return f"TargetFormat({self.sample_rate}, {self.channels}, {self.sample_width})"
+
+
+def device_format(device=None) -> TargetFormat:
+    """Format preferred by an output device, the default one if None. None if unknown."""
+    device = device if device is not None else QMediaDevices.defaultAudioOutput()
+    if device.isNull():
+        return None
+    preferred = device.preferredFormat()
+    if preferred.sampleRate() <= 0 or preferred.channelCount() <= 0:
+        return None
+    sample_width = {QAudioFormat.SampleFormat.UInt8: 1,
+                    QAudioFormat.SampleFormat.Int16: 2,
+                    QAudioFormat.SampleFormat.Int32: 4}.get(preferred.sampleFormat(), 2)
+    return TargetFormat(preferred.sampleRate(), preferred.channelCount(), sample_width)
+
+
+def pcm_to_float(clip: PcmClip) -> np.ndarray:
+    """Samples of a clip as a (frames, channels) float32 array in [-1, 1]."""
+    if clip.sample_width == 1:
+        samples = (np.frombuffer(clip.data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif clip.sample_width == 2:
+        samples = np.frombuffer(clip.data, dtype="<i2").astype(np.float32) / 32768
+    else:
+        samples = np.frombuffer(clip.data, dtype="<i4").astype(np.float32) / 2 ** 31
+    frames = len(samples) // clip.channels
+    return samples[:frames * clip.channels].reshape(frames, clip.channels)
+
+
+def float_to_pcm(samples: np.ndarray, sample_width: int) -> bytes:
+    """Integer PCM bytes of (frames, channels) samples in [-1, 1]."""
+    samples = np.clip(samples, -1, 1)
+    if sample_width == 1:
+        return np.round(samples * 127 + 128).astype(np.uint8).tobytes()
+    if sample_width == 4:
+        return np.round(samples * (2 ** 31 - 1)).astype("<i4").tobytes()
+    return np.round(samples * 32767).astype("<i2").tobytes()
+
+
+def lowpass(samples: np.ndarray, cutoff: float, taps: int = 101) -> np.ndarray:
+    """Windowed-sinc low-pass filter of (frames, channels) samples. cutoff: in fractions of the
+    sample rate, below 0.5."""
+    offsets = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * offsets) * np.blackman(taps)
+    kernel /= kernel.sum()
+    return np.stack([np.convolve(samples[:, channel], kernel, mode="same")
+                     for channel in range(samples.shape[1])], axis=1)
+
+
+def convert_clip(clip: PcmClip, target: TargetFormat) -> PcmClip:
+    """The clip in the target format."""
+    samples = pcm_to_float(clip)
+    if clip.channels != target.channels:
+        # Mixed down first, so that resampling works on one channel.
+        samples = samples.mean(axis=1, keepdims=True)
+    if clip.sample_rate != target.sample_rate and len(samples):
+        if target.sample_rate < clip.sample_rate:
+            # Frequencies above the new Nyquist frequency would fold back as aliases.
+            samples = lowpass(samples, 0.5 * target.sample_rate / clip.sample_rate)
+        count = round(len(samples) * target.sample_rate / clip.sample_rate)
+        positions = np.arange(count) * (clip.sample_rate / target.sample_rate)
+        source = np.arange(len(samples))
+        samples = np.stack([np.interp(positions, source, samples[:, channel])
+                            for channel in range(samples.shape[1])], axis=1)
+    if samples.shape[1] != target.channels:
+        samples = np.repeat(samples, target.channels, axis=1)
+    return PcmClip(target.sample_rate, target.channels, target.sample_width,
+                   float_to_pcm(samples, target.sample_width))
+
+
+def save_pcm(clip: PcmClip, file: Path):
+    """Write a clip to a WAV file, atomically: other processes may read the cache."""
+    handle, temporary = tempfile.mkstemp(suffix=".wav", dir=file.parent)
+    os.close(handle)
+    with wave.open(temporary, "wb") as wav:
+        wav.setnchannels(clip.channels)
+        wav.setsampwidth(clip.sample_width)
+        wav.setframerate(clip.sample_rate)
+        wav.writeframes(clip.data)
+    os.replace(temporary, file)
+
+
+class AudioConverter:
+    """Converts sound files to a target format in a background thread.
+    prepare() tells which sounds to have ready; converted_path() and converted_clip() return the
+    conversion if it is ready, else None, and the original is played meanwhile. The clips are
+    only kept in memory for backends playing PCM (see keep_clips). Sounds that cannot be
+    converted keep being played from the original; failures has the reason of each one."""
+
+    def __init__(self, target: TargetFormat, cache_dir: Path):
+        """Init."""
+        self.target = target
+        # Absolute: the converted files are played through URLs.
+        self.cache_dir = Path(cache_dir).absolute()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-convert")
+        self.lock = threading.Lock()
+        # Source path -> (size, modification time, content hash).
+        self.hashes = {}
+        # Source path -> converted file, or the source itself if it is in the format already.
+        self.paths = {}
+        # Source path -> converted clip, for the prepared sounds only.
+        self.clips = {}
+        # Source path -> error, for the sounds that could not be converted.
+        self.failures = {}
+        self.fixed = set()
+        self.wanted = set()
+        self.clips_kept = True
+
+    @classmethod
+    def for_device(cls, cache_dir: Path, device=None) -> "AudioConverter":
+        """Converter to the format of an output device, the default one if None. None if the
+        format of the device is unknown."""
+        target = device_format(device)
+        return cls(target, cache_dir) if target is not None else None
+
+    def content_hash(self, file: Path) -> str:
+        """Hash of the content of a file, read again only when its size or date change."""
+        stat = file.stat()
+        key = str(file)
+        cached = self.hashes.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = hashlib.sha1(file.read_bytes()).hexdigest()
+        self.hashes[key] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def convert_file(self, file: Path, load: bool = True) -> tuple:
+        """Convert a file, or take it from the disk cache. Returns (path, clip), the clip being
+        None if taken from the cache without load."""
+        cache_file = self.cache_dir / f"{self.content_hash(file)}_{self.target.key}.wav"
+        if cache_file.is_file():
+            return cache_file, load_pcm(cache_file) if load else None
+        clip = load_pcm(file)
+        if self.target.matches(clip):
+            return file, clip
+        clip = convert_clip(clip, self.target)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        save_pcm(clip, cache_file)
+        return cache_file, clip
+
+    def prepare(self, files, fixed: bool = False):
+        """Have these sounds converted. fixed: for the whole run (prompts, success sounds), else
+        they replace the sounds prepared before, whose clips are dropped from memory."""
+        keys = {str(file) for file in files}
+        with self.lock:
+            if fixed:
+                self.fixed |= keys
+            else:
+                self.wanted = keys
+            kept = self.fixed | self.wanted
+            self.clips = {key: clip for key, clip in self.clips.items() if key in kept}
+            missing = [key for key in keys if not self.is_ready(key)]
+        for key in missing:
+            self.executor.submit(self._convert, key)
+
+    def keep_clips(self, keep: bool):
+        """Whether to keep the clips of the prepared sounds in memory. Only backends playing PCM
+        need them; the others play the converted files."""
+        with self.lock:
+            self.clips_kept = keep
+            if not keep:
+                self.clips = {}
+            missing = [key for key in self.fixed | self.wanted if not self.is_ready(key)]
+        for key in missing:
+            self.executor.submit(self._convert, key)
+
+    def is_ready(self, key: str) -> bool:
+        """Whether a prepared sound is converted, with its clip if they are kept. Under the
+        lock."""
+        return key in self.clips if self.clips_kept else key in self.paths
+
+    def _convert(self, key: str):
+        """Conversion of one prepared sound, in the background thread."""
+        with self.lock:
+            if self.is_ready(key) or key not in self.fixed | self.wanted:
+                return
+            load = self.clips_kept
+        try:
+            path, clip = self.convert_file(Path(key), load)
+        except (OSError, EOFError, wave.Error) as error:
+            # EOFError has no message.
+            reason = str(error) or type(error).__name__
+            with self.lock:
+                self.failures[key] = reason
+            print(f"{key} not converted: {reason}", file=sys.stderr)
+            return
+        with self.lock:
+            self.failures.pop(key, None)
+            self.paths[key] = path
+            if self.clips_kept and clip is not None and key in self.fixed | self.wanted:
+                self.clips[key] = clip
+
+    def converted_path(self, file: Path) -> Path:
+        """File to play for a sound in the target format, or None if not ready."""
+        return self.paths.get(str(file))
+
+    def converted_clip(self, file: Path) -> PcmClip:
+        """Clip of a prepared sound in the target format, or None if not ready."""
+        return self.clips.get(str(file))
+
+    def invalidate(self, file: Path):
+        """The source file changed: convert it again if it is prepared."""
+        key = str(file)
+        with self.lock:
+            self.paths.pop(key, None)
+            self.clips.pop(key, None)
+            self.failures.pop(key, None)
+            prepared = key in self.fixed | self.wanted
+        if prepared and Path(key).is_file():
+            self.executor.submit(self._convert, key)
+
+    def wait(self):
+        """Block until the conversions submitted so far are done."""
+        self.executor.submit(lambda: None).result()
+
+    def close(self):
+        """Stop the background thread, dropping the pending conversions."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,220 @@
+"""
+Difficulty of the pairs.
+
+Each word of the corpus has a phonemic transcription (transcriptions.py, or the local lexicon) and
+each phoneme a vector of distinctive features. A pair is harder when its words differ by fewer
+features ("peur/beurre" by voicing only), when its words are longer, the difference being a smaller
+part of them, and when they are rarer. The scores, from 0 (easiest) to 1 (hardest), are computed
+with NumPy over the whole corpus at once and cached in cache/difficulty.json until the corpus,
+the transcriptions or the lexicon change.
+
+    python difficulty.py
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from lexicon import load_lexicon, default_lexicon_path, most_frequent_transcriptions
+from pairs import pairs
+from transcriptions import transcriptions
+
+
+FEATURE_NAMES = ("syllabic", "consonantal", "sonorant", "voice", "nasal", "continuant", "lateral",
+                 "strident", "labial", "coronal", "anterior", "dorsal", "high", "low", "back",
+                 "round", "tense")
+
+# Features of the phonemes of Lexique, the ones not listed being absent.
+FEATURES = {
+    "p": ("consonantal", "labial"),
+    "b": ("consonantal", "voice", "labial"),
+    "t": ("consonantal", "coronal", "anterior"),
+    "d": ("consonantal", "voice", "coronal", "anterior"),
+    "k": ("consonantal", "dorsal"),
+    "g": ("consonantal", "voice", "dorsal"),
+    "f": ("consonantal", "continuant", "strident", "labial"),
+    "v": ("consonantal", "voice", "continuant", "strident", "labial"),
+    "s": ("consonantal", "continuant", "strident", "coronal", "anterior"),
+    "z": ("consonantal", "voice", "continuant", "strident", "coronal", "anterior"),
+    "S": ("consonantal", "continuant", "strident", "coronal"),
+    "Z": ("consonantal", "voice", "continuant", "strident", "coronal"),
+    "m": ("consonantal", "sonorant", "voice", "nasal", "labial"),
+    "n": ("consonantal", "sonorant", "voice", "nasal", "coronal", "anterior"),
+    "N": ("consonantal", "sonorant", "voice", "nasal", "dorsal", "high"),
+    "G": ("consonantal", "sonorant", "voice", "nasal", "dorsal"),
+    "l": ("consonantal", "sonorant", "voice", "continuant", "lateral", "coronal", "anterior"),
+    "R": ("consonantal", "sonorant", "voice", "continuant", "dorsal", "back"),
+    "x": ("consonantal", "continuant", "dorsal", "back"),
+    "j": ("sonorant", "voice", "continuant", "dorsal", "high"),
+    "w": ("sonorant", "voice", "continuant", "labial", "dorsal", "high", "back", "round"),
+    "8": ("sonorant", "voice", "continuant", "labial", "dorsal", "high", "round"),
+    "i": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "high", "tense"),
+    "e": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "tense"),
+    "E": ("syllabic", "sonorant", "voice", "continuant", "dorsal"),
+    "a": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "low"),
+    "y": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "high", "round", "tense"),
+    "2": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "round", "tense"),
+    "9": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "round"),
+    "°": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "round"),
+    "u": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "high", "back", "round",
+          "tense"),
+    "o": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "back", "round", "tense"),
+    "O": ("syllabic", "sonorant", "voice", "continuant", "dorsal", "back", "round"),
+    "@": ("syllabic", "sonorant", "voice", "continuant", "nasal", "dorsal", "low", "back"),
+    "§": ("syllabic", "sonorant", "voice", "continuant", "nasal", "dorsal", "back", "round"),
+    "5": ("syllabic", "sonorant", "voice", "continuant", "nasal", "dorsal"),
+    "1": ("syllabic", "sonorant", "voice", "continuant", "nasal", "dorsal", "round"),
+}
+
+# Row 0 of the feature table is the gap of an added phoneme (no feature), then one row per phoneme.
+PHONEME_INDEX = {phoneme: index for index, phoneme in enumerate(FEATURES, start=1)}
+FEATURE_TABLE = np.array([[0] * len(FEATURE_NAMES)]
+                         + [[name in features for name in FEATURE_NAMES]
+                            for features in FEATURES.values()], dtype=np.int8)
+GAP = 0
+
+# Weights of the feature similarity, the length and the rarity of the words in the score.
+WEIGHTS = (0.6, 0.2, 0.2)
+
+CACHE_VERSION = 1
+
+
+def align(phon1: str, phon2: str) -> tuple:
+    """Phoneme indexes of two transcriptions, of the same length: when one is longer, a gap is
+    put in the other where it mismatches the least ("mu"/"mus" -> m u GAP / m u s).
+    Unknown phonemes count as gaps."""
+    first = [PHONEME_INDEX.get(phoneme, GAP) for phoneme in phon1]
+    second = [PHONEME_INDEX.get(phoneme, GAP) for phoneme in phon2]
+    while len(first) != len(second):
+        shorter, longer = (first, second) if len(first) < len(second) else (second, first)
+        best = min(range(len(shorter) + 1),
+                   key=lambda i: sum(a != b for a, b in zip(shorter[:i] + [GAP] + shorter[i:],
+                                                            longer)))
+        shorter.insert(best, GAP)
+    return first, second
+
+
+def pair_difficulty(phon_pairs: list, frequencies: np.ndarray = None) -> np.ndarray:
+    """Scores of pairs of transcriptions, from 0 (easiest) to 1 (hardest).
+    frequencies: (pairs, 2) frequencies of the words, or None if unknown."""
+    if not phon_pairs:
+        return np.zeros(0)
+    aligned = [align(phon1, phon2) for phon1, phon2 in phon_pairs]
+    width = max(len(first) for first, _ in aligned)
+    # (pairs, 2, width) phoneme indexes, padded with gaps, and their lengths.
+    indexes = np.full((len(aligned), 2, width), GAP, dtype=np.intp)
+    lengths = np.zeros(len(aligned))
+    for row, (first, second) in enumerate(aligned):
+        indexes[row, 0, :len(first)] = first
+        indexes[row, 1, :len(second)] = second
+        lengths[row] = (len(phon_pairs[row][0]) + len(phon_pairs[row][1])) / 2
+
+    # Features differing between the words, over all the positions.
+    features = FEATURE_TABLE[indexes]
+    distance = np.abs(features[:, 0].astype(np.int16) - features[:, 1]).sum(axis=(1, 2))
+
+    def normalized(values):
+        span = values.max() - values.min()
+        return (values - values.min()) / span if span else np.zeros_like(values, dtype=float)
+
+    similarity = 1 - normalized(distance.astype(float))
+    length = normalized(lengths)
+    if frequencies is None:
+        rarity = np.full(len(aligned), 0.5)
+    else:
+        # The rarer word of the pair, on a log scale.
+        rarity = 1 - normalized(np.log1p(np.min(frequencies, axis=1)))
+    similarity_weight, length_weight, rarity_weight = WEIGHTS
+    return similarity_weight * similarity + length_weight * length + rarity_weight * rarity
+
+
+def corpus_words(corpus: list) -> list:
+    """Words of the categories of a corpus, in order, once each."""
+    return list(dict.fromkeys(word for category in corpus for pair in category[1:]
+                              for word in pair))
+
+
+def corpus_key(corpus: list, lexicon_path: Path = None) -> str:
+    """Identifies the inputs of the scores: the corpus, the transcriptions, the features and the
+    size and date of the lexicon."""
+    digest = hashlib.sha1(repr((CACHE_VERSION, corpus, sorted(transcriptions.items()), FEATURES,
+                                WEIGHTS)).encode("utf-8"))
+    if lexicon_path is not None and Path(lexicon_path).is_file():
+        stat = Path(lexicon_path).stat()
+        digest.update(f"{lexicon_path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compute_difficulty(corpus: list, lexicon_path: Path = None) -> dict:
+    """Scores of all the pairs of a corpus. Returns {category: [score of each pair]}.
+    The frequencies, and the transcriptions of the words missing from transcriptions.py, come
+    from the lexicon if there is one. Pairs with a word transcribed nowhere get the median score."""
+    words = corpus_words(corpus)
+    phons = {word: transcriptions.get(word) for word in words}
+    frequencies = None
+    if lexicon_path is not None and Path(lexicon_path).is_file():
+        lexicon = most_frequent_transcriptions(load_lexicon(lexicon_path))
+        for word in words:
+            if phons[word] is None and word in lexicon:
+                phons[word] = lexicon[word].phon
+        frequencies = {word: lexicon[word].freq if word in lexicon else 0.0 for word in words}
+
+    all_pairs = [(category[0], pair) for category in corpus for pair in category[1:]]
+    known = [row for row, (_, pair) in enumerate(all_pairs)
+             if all(phons[word] for word in pair)]
+    scores = np.full(len(all_pairs), np.nan)
+    pair_frequencies = None
+    if frequencies is not None:
+        pair_frequencies = np.array([[frequencies[word] for word in all_pairs[row][1]]
+                                     for row in known]).reshape(-1, 2)
+    scores[known] = pair_difficulty([tuple(phons[word] for word in all_pairs[row][1])
+                                     for row in known], pair_frequencies)
+    scores[np.isnan(scores)] = np.median(scores[known]) if known else 0.5
+
+    result = {}
+    for (label, _), score in zip(all_pairs, scores):
+        result.setdefault(label, []).append(round(float(score), 4))
+    return result
+
+
+def load_difficulty(corpus: list, cache_dir: Path, lexicon_path: Path = None) -> dict:
+    """Scores of the pairs of a corpus from the cache, computed and cached first if missing or
+    outdated. Returns {category: [score of each pair]}."""
+    if lexicon_path is None:
+        lexicon_path = default_lexicon_path()
+    key = corpus_key(corpus, lexicon_path)
+    cache_file = cache_dir / "difficulty.json"
+    if cache_file.is_file():
+        with open(cache_file, "r", encoding="utf-8") as file:
+            cached = json.load(file)
+        if cached.get("key") == key:
+            return cached["scores"]
+
+    scores = compute_difficulty(corpus, lexicon_path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, "w", encoding="utf-8") as file:
+        json.dump({"key": key, "scores": scores}, file, ensure_ascii=False)
+    return scores
+
+
+def main(argv=None):
+    """Print the pairs of each category from the easiest to the hardest."""
+    parser = argparse.ArgumentParser(description="Rank the pairs by difficulty.")
+    parser.add_argument("--lexicon", default=None, help="lexicon giving the word frequencies")
+    parser.add_argument("--cache-dir", default="cache")
+    args = parser.parse_args(argv)
+
+    scores = load_difficulty(pairs, Path(args.cache_dir), args.lexicon)
+    for category in pairs:
+        label = category[0]
+        print(label)
+        for score, pair in sorted(zip(scores[label], category[1:]), key=lambda item: item[0]):
+            print(f"    {score:.2f}  {pair[0]} / {pair[1]}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
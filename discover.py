@@ -0,0 +1,289 @@
+"""
+Minimal pair discovery.
+
+Finds in a phonetic lexicon (see lexicon.py) every pair of words whose transcriptions differ only
+by the two sounds of a contrast: "pain" /p5/ and "bain" /b5/ for "p_b".
+
+Each transcription is put in a bucket keyed by itself with the contrast sound replaced by a
+wildcard (/*5/ for both "pain" and "bain"), so the search is one pass over the lexicon, O(N.L),
+instead of comparing all the pairs of words. Several contrasts are searched on several cores.
+
+    python discover.py lexique.tsv p_b ch_j an_on
+    python discover.py lexique.tsv --all --output new_pairs.py
+
+Pairs differing by one added phoneme, like the fin_* lists ("mou" /mu/ and "mousse" /mus/), are
+found with a deletion-neighborhood index: every transcription is looked up with each of its
+phonemes removed in turn among the transcriptions of the lexicon, again in one pass. The added
+phoneme can be restricted to the end or the start of the word, and to some phonemes:
+
+    python discover.py lexique.tsv --additions final --phonemes s t l r m p
+
+The output is in the format of pairs.pairs, or of the fin_* lists for additions. Words without
+image or sound in data/ are flagged in a comment, as are the pairs already in pairs.py.
+"""
+
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lexicon import load_lexicon, contrast_phonemes, sound_phoneme, phoneme_name
+from manifest import DATA_DIR, corpus_pairs
+from pairs import pairs
+
+
+def bucket_contrast(entries: list, phoneme_a: str, phoneme_b: str) -> dict:
+    """Bucket the entries containing either sound by their wildcarded transcription.
+    Returns {(prefix, suffix): ([entries with a], [entries with b])}."""
+    buckets = {}
+    sounds = ((phoneme_a, 0), (phoneme_b, 1))
+    for entry in entries:
+        phon = entry.phon
+        for sound, side in sounds:
+            length = len(sound)
+            start = phon.find(sound)
+            while start != -1:
+                key = (phon[:start], phon[start + length:])
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = ([], [])
+                bucket[side].append(entry)
+                start = phon.find(sound, start + 1)
+    return buckets
+
+
+def most_frequent_spellings(entries: list) -> list:
+    """Keep one word per transcription, the most frequent: "vert" rather than "vers", "ver",
+    "verre" which sound the same."""
+    best = {}
+    for entry in entries:
+        if entry.phon not in best or entry.freq > best[entry.phon].freq:
+            best[entry.phon] = entry
+    return list(best.values())
+
+
+def find_minimal_pairs(entries: list, label: str, all_spellings: bool = False,
+                       min_freq: float = 0.0) -> list:
+    """Minimal pairs of a contrast, as [word with the first sound, word with the second sound],
+    the most frequent pairs first."""
+    phoneme_a, phoneme_b = contrast_phonemes(label)
+    if min_freq:
+        entries = [entry for entry in entries if entry.freq >= min_freq]
+    found = {}
+    for side_a, side_b in bucket_contrast(entries, phoneme_a, phoneme_b).values():
+        if not side_a or not side_b:
+            continue
+        if not all_spellings:
+            side_a = most_frequent_spellings(side_a)
+            side_b = most_frequent_spellings(side_b)
+        for entry_a in side_a:
+            for entry_b in side_b:
+                if entry_a.word != entry_b.word:
+                    found[(entry_a.word, entry_b.word)] = min(entry_a.freq, entry_b.freq)
+    return [list(pair) for pair, _ in sorted(found.items(), key=lambda item: -item[1])]
+
+
+# Names of the lists of addition pairs, by position of the added phoneme.
+ADDITION_PREFIXES = {"final": "fin", "initial": "debut", "any": "ajout"}
+
+
+def find_addition_pairs(entries: list, position: str = "final", phonemes: set = None,
+                        all_spellings: bool = False, min_freq: float = 0.0) -> dict:
+    """Pairs of words whose transcriptions differ by one added phoneme, as [shorter word, longer
+    word], the most frequent pairs first. position is "final", "initial" or "any"; phonemes
+    restricts the added phoneme. Returns {added phoneme: pairs}."""
+    if min_freq:
+        entries = [entry for entry in entries if entry.freq >= min_freq]
+    # Index of the transcriptions: the words one phoneme shorter than a word are found by
+    # looking up its deletions.
+    index = {}
+    for entry in entries:
+        index.setdefault(entry.phon, []).append(entry)
+    if not all_spellings:
+        index = {phon: most_frequent_spellings(words) for phon, words in index.items()}
+
+    found = {}
+    for phon, longer in index.items():
+        if position == "final":
+            positions = (len(phon) - 1,)
+        elif position == "initial":
+            positions = (0,)
+        else:
+            positions = range(len(phon))
+        for i in positions:
+            added = phon[i]
+            if phonemes is not None and added not in phonemes:
+                continue
+            shorter = index.get(phon[:i] + phon[i + 1:])
+            if not shorter:
+                continue
+            pairs_found = found.setdefault(added, {})
+            for entry_a in shorter:
+                for entry_b in longer:
+                    if entry_a.word != entry_b.word:
+                        pairs_found[(entry_a.word, entry_b.word)] = min(entry_a.freq, entry_b.freq)
+    return {added: [list(pair) for pair, _ in sorted(pairs_found.items(),
+                                                     key=lambda item: -item[1])]
+            for added, pairs_found in sorted(found.items())}
+
+
+def missing_assets(word: str, data_dir: Path = DATA_DIR) -> list:
+    """What the application lacks to use a word: "d'image", "de son"."""
+    missing = []
+    if not (data_dir / "images" / f"{word}.png").is_file():
+        missing.append("d'image")
+    if not (data_dir / "sounds" / f"{word}.wav").is_file():
+        missing.append("de son")
+    return missing
+
+
+def format_pair_comment(pair: list, known_pairs: set) -> str:
+    """Comment flagging a pair already in the corpus, or the words lacking image or sound."""
+    notes = []
+    if tuple(sorted(pair)) in known_pairs:
+        notes.append("déjà dans pairs.py")
+    for word in pair:
+        missing = missing_assets(word)
+        if missing:
+            notes.append(f"{word} : pas {' ni '.join(missing)}")
+    return f"  # {'; '.join(notes)}" if notes else ""
+
+
+def python_string(text: str) -> str:
+    """Python literal of a string, quotes and backslashes escaped, in double quotes like pairs.py
+    when the string has no quote."""
+    literal = repr(text)
+    if literal.startswith("'") and '"' not in text:
+        literal = f'"{literal[1:-1]}"'
+    return literal
+
+
+def format_categories(categories: dict) -> str:
+    """Python source of the categories, in the format of pairs.pairs."""
+    known_pairs = {tuple(sorted((word1, word2))) for _, _, word1, word2 in corpus_pairs()}
+    lines = ["pairs = [", ""]
+    for label, found in categories.items():
+        lines.append(f"    [{python_string(label)},")
+        for pair in found:
+            comment = format_pair_comment(pair, known_pairs)
+            lines.append(f"        [{python_string(pair[0])}, {python_string(pair[1])}],{comment}")
+        lines.append("     ],")
+        lines.append("")
+    lines.append("]")
+    return "\n".join(lines) + "\n"
+
+
+def format_lists(lists: dict) -> str:
+    """Python source of plain lists of pairs, in the format of the fin_* lists."""
+    known_pairs = {tuple(sorted((word1, word2))) for _, _, word1, word2 in corpus_pairs()}
+    lines = []
+    for name, found in lists.items():
+        lines.append(f"{name} = [")
+        for pair in found:
+            comment = format_pair_comment(pair, known_pairs)
+            lines.append(f"    [{python_string(pair[0])}, {python_string(pair[1])}],{comment}")
+        lines.append("]")
+        lines.append("")
+        lines.append("")
+    return "\n".join(lines[:-2]) + "\n"
+
+
+def discover_additions(lexicon_path: str, position: str = "final", sounds: list = None,
+                       all_spellings: bool = False, min_freq: float = 0.0,
+                       limit: int = None) -> dict:
+    """Search the addition pairs. Returns {list name: pairs}, the lists named like in pairs.py:
+    fin_s, fin_ch, ..."""
+    phonemes = {sound_phoneme(sound) for sound in sounds} if sounds else None
+    entries = load_lexicon(lexicon_path)
+    found = find_addition_pairs(entries, position, phonemes, all_spellings, min_freq)
+    prefix = ADDITION_PREFIXES[position]
+    return {f"{prefix}_{phoneme_name(added)}": pairs_found[:limit]
+            for added, pairs_found in sorted(found.items(),
+                                             key=lambda item: phoneme_name(item[0]))}
+
+
+# Lexicon of the worker processes, loaded once per process.
+_worker_entries = None
+
+
+def _init_worker(lexicon_path: str):
+    """Load the lexicon in a worker process."""
+    global _worker_entries  # pylint: disable = global-statement
+    _worker_entries = load_lexicon(lexicon_path)
+
+
+def _find_in_worker(label: str, all_spellings: bool, min_freq: float) -> list:
+    """find_minimal_pairs() on the lexicon of the worker."""
+    return find_minimal_pairs(_worker_entries, label, all_spellings, min_freq)
+
+
+def discover(lexicon_path: str, labels: list, all_spellings: bool = False,
+             min_freq: float = 0.0, limit: int = None, workers: int = None) -> dict:
+    """Search the contrasts in parallel. Returns {label: pairs}."""
+    if len(labels) == 1 or workers == 1:
+        entries = load_lexicon(lexicon_path)
+        results = [find_minimal_pairs(entries, label, all_spellings, min_freq)
+                   for label in labels]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(str(lexicon_path),)) as executor:
+            results = list(executor.map(_find_in_worker, labels,
+                                        [all_spellings] * len(labels),
+                                        [min_freq] * len(labels)))
+    return {label: found[:limit] for label, found in zip(labels, results)}
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Find minimal pairs in a phonetic lexicon.")
+    parser.add_argument("lexicon", help="TSV lexicon with ortho and phon columns (Lexique)")
+    parser.add_argument("contrasts", nargs="*", help='contrasts, as in pairs.py: "p_b", "ch_j"')
+    parser.add_argument("--all", action="store_true", help="every contrast of pairs.py")
+    parser.add_argument("--additions", choices=list(ADDITION_PREFIXES), default=None,
+                        help="find pairs differing by one phoneme added at this position instead")
+    parser.add_argument("--phonemes", nargs="+", default=None,
+                        help='with --additions, only these added sounds: "s", "ch"')
+    parser.add_argument("--min-freq", type=float, default=0.0,
+                        help="ignore the words less frequent than this")
+    parser.add_argument("--limit", type=int, default=None, help="pairs per contrast")
+    parser.add_argument("--all-spellings", action="store_true",
+                        help="keep the homophones instead of the most frequent spelling")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Transcriptions have one character per phoneme: a cluster like "tr" can never be the added
+    # phoneme of a pair.
+    clusters = [sound for sound in args.phonemes or [] if len(sound_phoneme(sound)) != 1]
+    if clusters:
+        parser.error(f"--phonemes takes single sounds, not {', '.join(clusters)}")
+    if args.additions:
+        lists = discover_additions(args.lexicon, args.additions, args.phonemes,
+                                   args.all_spellings, args.min_freq, args.limit)
+        write_source(format_lists(lists), lists, args.output)
+        return
+
+    labels = list(args.contrasts)
+    if args.all:
+        labels += [category[0] for category in pairs if category[0] not in labels]
+    if not labels:
+        parser.error("give at least one contrast, or --all")
+
+    categories = discover(args.lexicon, labels, args.all_spellings, args.min_freq, args.limit,
+                          args.workers)
+    write_source(format_categories(categories), categories, args.output)
+
+
+def write_source(source: str, found: dict, output: str = None):
+    """Write the generated source to a file, with a summary on stdout, or print it."""
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(source)
+        for name, pairs_found in found.items():
+            print(f"{name}: {len(pairs_found)} pairs")
+    else:
+        print(source, end="")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Exercise engine.
+
+Session logic without any Qt dependency: choosing a category, presenting a pair, scoring answers
+and picking the next pair. MainWindow is a view on top of it; the simulation harness drives it
+directly.
+"""
+
+import random
+import time
+
+
+class EngineState:
+    """States of the exercise engine."""
+    IDLE = "idle"  # No pair presented yet.
+    AWAITING_ANSWER = "awaiting_answer"  # A pair is presented, waiting for an image click.
+    ANSWERED = "answered"  # The right image was clicked, waiting for the next pair.
+
+
+class CurrentItem:
+    """Store current item info."""
+
+    def __init__(self, word1: str, word2: str, audio: str):
+        """Init."""
+
+        self.word1 = word1
+        self.word2 = word2
+        self.audio = audio
+        self.score = 0
+        self.total_attempts = 0
+
+
+class AnswerResult:
+    """Outcome of one click on an image.
+    The sides tell which word of the pair, as written in the corpus, was asked and clicked: for
+    ["pain", "bain"] in "p_b", side 0 is "p" and side 1 is "b"."""
+
+    def __init__(self, selected_word: str, correct_word: str, response_time: float,
+                 category: str = None, selected_side: int = None, correct_side: int = None):
+        """Init."""
+        self.selected_word = selected_word
+        self.correct_word = correct_word
+        self.correct = selected_word == correct_word
+        self.response_time = response_time
+        self.category = category
+        self.selected_side = selected_side
+        self.correct_side = correct_side
+
+
+class ExerciseEngine:
+    """State machine over a corpus of minimal pairs.
+    rng and clock are injectable so that sessions can be replayed and simulated:
+    rng is a random.Random instance, clock a callable returning seconds."""
+
+    # Sounds played around the words when the answer is wrong.
+    THIS_IS_SOUND = "_ça c'est"
+    SHOW_ME_SOUND = "_montre moi"
+
+    def __init__(self, corpus: list, rng: random.Random = None, clock=None):
+        """Init."""
+        self.corpus = corpus
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock if clock is not None else time.monotonic
+
+        self.state = EngineState.IDLE
+        self.category = None
+        self.category_pairs = []
+        self.row = -1
+        self.current_item = None
+        self.presented_at = None
+        # {category: [difficulty of each pair]} to present the pairs from the easiest, or None
+        # for the order of the corpus.
+        self.difficulty = None
+
+    def categories(self) -> list:
+        """Return the category labels of the corpus ("p_b", "t_d", etc.)."""
+        return [category[0] for category in self.corpus]
+
+    def select_category(self, label: str) -> list:
+        """Select a category and return its word pairs. Nothing is presented yet."""
+        for category in self.corpus:
+            if category[0] == label:
+                self.category = label
+                self.category_pairs = self.ordered_pairs(category)
+                break
+        else:
+            raise KeyError(f"Unknown category: {label}")
+
+        self.row = -1
+        self.current_item = None
+        self.state = EngineState.IDLE
+        return self.category_pairs
+
+    def ordered_pairs(self, category: list) -> list:
+        """Pairs of a category of the corpus, from the easiest if difficulties are set."""
+        category_pairs = [list(pair) for pair in category[1:]]
+        scores = self.difficulty.get(category[0]) if self.difficulty is not None else None
+        if scores is None or len(scores) != len(category_pairs):
+            return category_pairs
+        # Stable: pairs of the same difficulty keep the order of the corpus.
+        order = sorted(range(len(category_pairs)), key=lambda row: scores[row])
+        return [category_pairs[row] for row in order]
+
+    def set_difficulty(self, difficulty: dict):
+        """Order the pairs by difficulty ({category: [score of each pair]}), or as in the corpus
+        if None. The current category is reordered in place: the presented pair stays presented,
+        at its new row."""
+        self.difficulty = difficulty
+        self.update_corpus(self.corpus)
+
+    def update_corpus(self, corpus: list):
+        """Switch to another version of the corpus, edited while the session runs. The current
+        category is kept if it still exists, and the presented pair if it is still in it."""
+        self.corpus = corpus
+        if self.category is None:
+            return
+        current = self.category_pairs[self.row] if self.row != -1 else None
+        for category in corpus:
+            if category[0] == self.category:
+                self.category_pairs = self.ordered_pairs(category)
+                break
+        else:
+            self.category = None
+            self.category_pairs = []
+        if current is not None and current in self.category_pairs:
+            self.row = self.category_pairs.index(current)
+        else:
+            self.row = -1
+            self.current_item = None
+            self.state = EngineState.IDLE
+
+    def select_row(self, row: int) -> CurrentItem:
+        """Present the pair at the given row of the current category."""
+        pair = list(self.category_pairs[row])
+        # Word are shuffled so not always the same image at the same place.
+        self.rng.shuffle(pair)
+        # Pick a random word as good response, which will be pronounced (audio).
+        audio = self.rng.choice(pair)
+
+        self.row = row
+        self.current_item = CurrentItem(pair[0], pair[1], audio)
+        self.presented_at = self.clock()
+        self.state = EngineState.AWAITING_ANSWER
+        return self.current_item
+
+    def answer(self, selected_word: str) -> AnswerResult:
+        """Score a click on the image of selected_word.
+        Returns None if no pair is waiting for an answer."""
+        if self.state != EngineState.AWAITING_ANSWER:
+            return None
+
+        pair = self.category_pairs[self.row]
+        result = AnswerResult(selected_word, self.current_item.audio,
+                              self.clock() - self.presented_at, category=self.category,
+                              selected_side=pair.index(selected_word),
+                              correct_side=pair.index(self.current_item.audio))
+        if result.correct:
+            self.current_item.score += 1
+            self.state = EngineState.ANSWERED
+        self.current_item.total_attempts += 1
+        return result
+
+    def feedback_sounds(self, result: AnswerResult) -> list:
+        """Names of the sounds to play after a wrong answer:
+        "This is..." + wrong word, then "Show me..." + the word we ask."""
+        if result.correct:
+            return []
+        return [self.THIS_IS_SOUND, result.selected_word,
+                self.SHOW_ME_SOUND, result.correct_word]
+
+    def next_row(self, random_order: bool = True) -> int:
+        """Return the row of the next pair : next in the category or random.
+        With difficulties set, the pairs go from the easiest to the hardest: random_order is
+        ignored. Returns -1 if no pair has been presented yet."""
+        if self.row == -1:
+            return -1
+
+        count = len(self.category_pairs)
+        if count == 1:
+            return 0
+
+        if random_order and self.difficulty is None:
+            # Chooses a new random row different from the current one.
+            new_row = self.row
+            while new_row == self.row:
+                new_row = self.rng.randint(0, count - 1)
+            return new_row
+
+        # If the current item is the last one, loop back to the first item.
+        return (self.row + 1) % count
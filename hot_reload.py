@@ -0,0 +1,227 @@
+"""
+Hot reload.
+
+Watches the corpus (pairs.py) and the pictures and sounds of data/ while the application runs, so
+that the words and pictures added by the therapist can be used without restarting, and without
+losing the session in progress.
+
+Each picture and sound is watched individually and the directories for new and removed files
+(inotify, ReadDirectoryChangesW, etc. through QFileSystemWatcher), so that a change costs the
+reload of the changed file only. When the system cannot watch, the files are polled instead.
+"""
+
+# pylint: disable = no-name-in-module
+
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, Signal
+
+
+class CorpusDiff:
+    """Categories added, removed and changed between two versions of the corpus."""
+
+    def __init__(self, added: list, removed: list, changed: list):
+        """Init."""
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f"+{len(self.added)} -{len(self.removed)} ~{len(self.changed)} categories"
+
+
+def load_corpus_file(file_path: Path) -> list:
+    """The `pairs` list of a corpus file, executed apart from the imported module."""
+    namespace = {"__name__": "pairs", "__file__": str(file_path)}
+    with open(file_path, "r", encoding="utf-8") as file:
+        exec(compile(file.read(), str(file_path), "exec"), namespace)  # pylint: disable = exec-used
+    return namespace["pairs"]
+
+
+def diff_corpus(old: list, new: list) -> CorpusDiff:
+    """Compare two corpora category by category."""
+    old_categories = {category[0]: category[1:] for category in old}
+    new_categories = {category[0]: category[1:] for category in new}
+    return CorpusDiff(
+        added=[label for label in new_categories if label not in old_categories],
+        removed=[label for label in old_categories if label not in new_categories],
+        changed=[label for label, word_pairs in new_categories.items()
+                 if label in old_categories and old_categories[label] != word_pairs])
+
+
+class CorpusIndex:
+    """The categories using each word, to know which ones a changed picture affects."""
+
+    def __init__(self, corpus: list):
+        """Init."""
+        self.categories = {}  # word -> set of category labels
+        for category in corpus:
+            self.add_category(category)
+
+    def add_category(self, category: list):
+        """Index the words of a category."""
+        for pair in category[1:]:
+            for word in pair:
+                self.categories.setdefault(word, set()).add(category[0])
+
+    def remove_category(self, label: str, word_pairs: list):
+        """Forget the words of a category."""
+        for pair in word_pairs:
+            for word in pair:
+                labels = self.categories.get(word)
+                if labels is not None:
+                    labels.discard(label)
+                    if not labels:
+                        del self.categories[word]
+
+    def update(self, old: list, new: list, diff: CorpusDiff):
+        """Re-index the categories of the diff only."""
+        old_categories = {category[0]: category for category in old}
+        for label in diff.removed + diff.changed:
+            self.remove_category(label, old_categories[label][1:])
+        for category in new:
+            if category[0] in diff.added or category[0] in diff.changed:
+                self.add_category(category)
+
+    def categories_of(self, word: str) -> set:
+        """Labels of the categories using a word."""
+        return self.categories.get(word, set())
+
+
+class CorpusWatcher(QObject):
+    """Emits corpusChanged(corpus, diff) when the corpus file changes, corpusError(message) when
+    it cannot be loaded, and assetChanged(kind, word) when a picture or sound is added, modified
+    or removed.
+    directories: {kind: (directory, suffix)}, like {"image": (data/images, ".png")}."""
+
+    corpusChanged = Signal(list, object)
+    corpusError = Signal(str)
+    assetChanged = Signal(str, str)
+
+    # Editors and file copies write in several steps: changes are handled once they settle.
+    SETTLE_MS = 300
+
+    def __init__(self, corpus_file: Path, corpus: list, directories: dict,
+                 poll_interval: float = 2.0, force_polling: bool = False, parent=None):
+        """Init."""
+        super().__init__(parent)
+        self.corpus_file = str(corpus_file)
+        self.corpus = corpus
+        self.directories = {str(directory): (kind, suffix)
+                            for kind, (directory, suffix) in directories.items()}
+        # Watched asset files: path -> (kind, word), and the file names of each directory.
+        self.files = {}
+        self.names = {directory: self.list_names(directory) for directory in self.directories}
+        for directory, names in self.names.items():
+            for name in names:
+                self.files[os.path.join(directory, name)] = self.asset_of(directory, name)
+        self.pending_files = set()
+        self.pending_directories = set()
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(self.SETTLE_MS)
+        self.settle_timer.timeout.connect(self.flush)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        paths = [path for path in [self.corpus_file, *self.directories, *self.files]
+                 if os.path.exists(path)]
+        failed = self.watcher.addPaths(paths) if paths and not force_polling else []
+
+        # Polling fallback: modification times of everything watched.
+        self.stamps = None
+        self.poll_timer = None
+        if failed or force_polling:
+            self.stamps = self.stat_all()
+            self.poll_timer = QTimer(self)
+            self.poll_timer.timeout.connect(self.poll)
+            self.poll_timer.start(int(poll_interval * 1000))
+
+    def list_names(self, directory: str) -> set:
+        """Names of the assets of a directory."""
+        suffix = self.directories[directory][1]
+        try:
+            return {name for name in os.listdir(directory) if name.lower().endswith(suffix)}
+        except OSError:
+            return set()
+
+    def asset_of(self, directory: str, name: str) -> tuple:
+        """(kind, word) of an asset file."""
+        return self.directories[directory][0], os.path.splitext(name)[0]
+
+    def on_file_changed(self, path: str):
+        """A watched file was modified, replaced or removed."""
+        # Saving by replacing the file drops the watch: watch the new file.
+        if path not in self.watcher.files() and os.path.exists(path):
+            self.watcher.addPath(path)
+        self.pending_files.add(path)
+        self.settle_timer.start()
+
+    def on_directory_changed(self, path: str):
+        """A file was added to, removed from or renamed in a watched directory."""
+        self.pending_directories.add(path)
+        self.settle_timer.start()
+
+    def flush(self):
+        """Handle the changes collected since the last flush."""
+        for directory in self.pending_directories:
+            names = self.list_names(directory)
+            for name in names ^ self.names[directory]:
+                path = os.path.join(directory, name)
+                if name in names:
+                    self.files[path] = self.asset_of(directory, name)
+                    if self.poll_timer is None:
+                        self.watcher.addPath(path)
+                else:
+                    self.files.pop(path, None)
+                self.pending_files.add(path)
+            self.names[directory] = names
+        self.pending_directories = set()
+
+        for path in self.pending_files:
+            if path == self.corpus_file:
+                self.reload_corpus()
+            elif path in self.files or os.path.dirname(path) in self.directories:
+                kind, word = self.asset_of(os.path.dirname(path), os.path.basename(path))
+                self.assetChanged.emit(kind, word)
+        self.pending_files = set()
+
+    def reload_corpus(self):
+        """Read the corpus file again and emit what changed. A file with errors is ignored, the
+        previous corpus staying in use."""
+        try:
+            corpus = load_corpus_file(Path(self.corpus_file))
+        except Exception as error:  # pylint: disable = broad-exception-caught
+            self.corpusError.emit(f"{type(error).__name__}: {error}")
+            return
+        diff = diff_corpus(self.corpus, corpus)
+        if diff:
+            self.corpus = corpus
+            self.corpusChanged.emit(corpus, diff)
+
+    def stat_all(self) -> dict:
+        """Modification times of the corpus file and the asset files, and the directory names."""
+        stamps = {}
+        for path in [self.corpus_file, *self.files]:
+            try:
+                stamps[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def poll(self):
+        """Fallback when the files cannot be watched: compare the modification times."""
+        for directory in self.directories:
+            if self.list_names(directory) != self.names[directory]:
+                self.pending_directories.add(directory)
+        stamps = self.stat_all()
+        self.pending_files.update(path for path, stamp in stamps.items()
+                                  if self.stamps.get(path) != stamp)
+        self.flush()
+        self.stamps = self.stat_all()
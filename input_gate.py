@@ -0,0 +1,98 @@
+"""
+Input gate.
+
+While feedback is playing, clicks on the images, the lists and the buttons must not re-enter the
+exercise (stacked sounds, skipped items). Instead of enabling/disabling widgets, every input goes
+through the gate, which is closed while a sound plays.
+"""
+
+from contextlib import contextmanager
+
+
+ACCEPTED = "accepted"
+DROPPED = "dropped"
+COALESCED = "coalesced"
+
+
+class InputGate:
+    """Drop or coalesce user inputs while feedback is playing.
+    Inputs whose kind is in coalesce_kinds are kept (only the last one) and run when the gate
+    opens again; other inputs are dropped. Each input costs a counter update, whatever the number
+    of widgets. when_open() defers the rest of a feedback to its end.
+    on_release(kind, args), if set, is called when a coalesced input finally runs."""
+
+    def __init__(self, coalesce_kinds=("list_a", "list_b")):
+        """Init."""
+        self.coalesce_kinds = set(coalesce_kinds)
+        self.depth = 0
+        self.pending = {}
+        self.dropped = {}
+        self.deferred = []
+        self.on_release = None
+
+    @property
+    def is_open(self) -> bool:
+        """True when no feedback is playing."""
+        return self.depth == 0
+
+    @property
+    def dropped_total(self) -> int:
+        """Number of inputs dropped or replaced by a later one since the start."""
+        return sum(self.dropped.values())
+
+    def outcome(self, kind: str) -> str:
+        """What submit() would do with an input of this kind now: ACCEPTED (run at once), COALESCED
+        (run when the gate opens, unless a later input of the same kind replaces it) or DROPPED."""
+        if self.depth == 0:
+            return ACCEPTED
+        return COALESCED if kind in self.coalesce_kinds else DROPPED
+
+    def submit(self, kind: str, callback, *args) -> str:
+        """Run callback(*args) now if the gate is open. Returns the outcome, as outcome()."""
+        result = self.outcome(kind)
+        if result == ACCEPTED:
+            callback(*args)
+            return result
+
+        # The replaced pending input, or this one, is lost.
+        if result == DROPPED or kind in self.pending:
+            self.dropped[kind] = self.dropped.get(kind, 0) + 1
+        if result == COALESCED:
+            self.pending[kind] = (callback, args)
+        return result
+
+    def when_open(self, callback, *args):
+        """Run callback(*args) now if the gate is open, else when it opens again, before the
+        coalesced inputs."""
+        if self.depth == 0:
+            callback(*args)
+        else:
+            self.deferred.append((callback, args))
+
+    def close(self):
+        """Feedback started. Calls can be nested."""
+        self.depth += 1
+
+    def open(self):
+        """Feedback ended. Run the deferred calls and the coalesced inputs once the outermost
+        feedback ends."""
+        self.depth -= 1
+        if self.depth == 0:
+            while self.deferred and self.depth == 0:
+                callback, args = self.deferred.pop(0)
+                callback(*args)
+            while self.pending and self.depth == 0:
+                kind = next(iter(self.pending))
+                callback, args = self.pending.pop(kind)
+                if self.on_release is not None:
+                    self.on_release(kind, args)
+                callback(*args)
+
+    @contextmanager
+    def closed(self):
+        """Keep the gate closed for the duration of the with block."""
+        self.close()
+        try:
+            yield
+        finally:
+            self.open()
@@ -0,0 +1,109 @@
+"""
+Phonetic lexicon.
+
+Loads a local lexicon file: a TSV with a header, one word per line with its phonemic transcription
+and optionally a frequency, like Lexique (http://www.lexique.org). Transcriptions use one character
+per phoneme, as in Lexique:
+
+    vowels     a i y u o O e E ° 2 9   nasal vowels  @ (an) § (on) 5 (in) 1 (un)
+    consonants p b t d k g f v s z S (ch) Z (j) m n N (gn) G (ng) l R j (y) w 8 (ui) x
+"""
+
+import csv
+from pathlib import Path
+
+
+# Names of the sounds in the category labels of pairs.py ("p_b", "ch_j", "an_on", ...) and their
+# transcription. Clusters (tr, kr) are transcribed as several phonemes.
+SOUNDS = {
+    "p": "p", "b": "b", "t": "t", "d": "d", "k": "k", "g": "g",
+    "f": "f", "v": "v", "s": "s", "z": "z", "ch": "S", "j": "Z",
+    "m": "m", "n": "n", "gn": "N", "l": "l", "r": "R", "y": "j",
+    "a": "a", "i": "i", "u": "y", "ou": "u", "o": "o", "ô": "o", "è": "E", "é": "e",
+    "e": "°", "eu": "2", "oe": "9", "an": "@", "on": "§", "in": "5", "un": "1",
+    "tr": "tR", "kr": "kR", "pr": "pR", "br": "bR", "gr": "gR", "dr": "dR",
+}
+
+
+# Name of each phoneme in the list names of the generated exercises (fin_s, fin_ch, ...): the name
+# of its sound above, or a name for the phonemes which have none.
+# The first name of a phoneme wins ("o" rather than "ô").
+PHONEME_NAMES = {phoneme: name for name, phoneme in reversed(SOUNDS.items()) if len(phoneme) == 1}
+PHONEME_NAMES.update({"O": "o_ouvert", "8": "ui", "w": "w", "G": "ng", "x": "x"})
+
+
+class LexiconEntry:
+    """A word of the lexicon."""
+
+    __slots__ = ("word", "phon", "freq")
+
+    def __init__(self, word: str, phon: str, freq: float = 0.0):
+        """Init."""
+        self.word = word
+        self.phon = phon
+        self.freq = freq
+
+    def __repr__(self):
+        return f"LexiconEntry({self.word!r}, {self.phon!r}, {self.freq!r})"
+
+
+def load_lexicon(file_path, word_column: str = "ortho", phon_column: str = "phon",
+                 freq_column: str = "freqfilms2") -> list:
+    """Read a lexicon TSV. A word listed several times (one line per grammatical category in
+    Lexique) is kept once per transcription, with its highest frequency.
+    The frequency column is optional."""
+    entries = {}
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = next(reader)
+        word_index = header.index(word_column)
+        phon_index = header.index(phon_column)
+        freq_index = header.index(freq_column) if freq_column in header else None
+        for row in reader:
+            if len(row) <= max(word_index, phon_index):
+                continue
+            word, phon = row[word_index], row[phon_index]
+            if not word or not phon:
+                continue
+            try:
+                freq = float(row[freq_index]) if freq_index is not None else 0.0
+            except (ValueError, IndexError):
+                freq = 0.0
+            entry = entries.get((word, phon))
+            if entry is None:
+                entries[(word, phon)] = LexiconEntry(word, phon, freq)
+            elif freq > entry.freq:
+                entry.freq = freq
+    return list(entries.values())
+
+
+def most_frequent_transcriptions(entries: list) -> dict:
+    """The most frequent entry of each word: {word: entry}."""
+    best = {}
+    for entry in entries:
+        if entry.word not in best or entry.freq > best[entry.word].freq:
+            best[entry.word] = entry
+    return best
+
+
+def contrast_phonemes(label: str) -> tuple:
+    """Transcriptions of the two sounds of a category label: "ch_j" -> ("S", "Z").
+    Sounds not in SOUNDS are taken as transcriptions already: "S_Z" -> ("S", "Z")."""
+    first, second = label.split("_")
+    return sound_phoneme(first), sound_phoneme(second)
+
+
+def sound_phoneme(name: str) -> str:
+    """Transcription of a single sound: "ch" -> "S". Names not in SOUNDS are taken as
+    transcriptions already."""
+    return SOUNDS.get(name, name)
+
+
+def phoneme_name(phoneme: str) -> str:
+    """Name of a phoneme usable in a Python identifier: "S" -> "ch"."""
+    return PHONEME_NAMES.get(phoneme, phoneme)
+
+
+def default_lexicon_path() -> Path:
+    """Where the lexicon is looked for when none is given: next to the options file."""
+    return Path("lexique.tsv")
@@ -6,26 +6,40 @@ Application.
 
 
 import sys
+import argparse
+from collections import deque
+import multiprocessing
 import json
 import importlib.resources
 import random
-import time
 import os
 import platform
 import subprocess
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QUrl
+from PySide6.QtCore import Qt, QObject, QTimer
 from PySide6.QtGui import QPixmap, QIcon
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
                                QWidgetAction,
                                QListWidget, QListWidgetItem, QCheckBox,
                                QPushButton, QLabel, QWidget, QSizePolicy,
-                               QDialog, QDialogButtonBox,
+                               QDialog, QDialogButtonBox, QInputDialog, QFileDialog,
+                               QMessageBox, QProgressDialog,
                                QMenu, QMenuBar)
-from PySide6.QtMultimedia import QSoundEffect
 
 from pairs import pairs
+from engine import ExerciseEngine
+from input_gate import InputGate
+from audio import LatencyProbe, create_backend, load_pcm
+from assets import AssetCache, AssetSet
+from responses import ResponseRecorder
+from analytics import AnalyticsDialog
+from session_trace import TraceRecorder
+from atlas import CategoryOverviewDialog, invalidate as invalidate_atlas
+from difficulty import load_difficulty
+from hot_reload import CorpusIndex, CorpusWatcher
+from worksheet import WorksheetExport
+from audio_convert import AudioConverter
 
 
 class SoftwareInfo:
@@ -46,6 +60,12 @@ class PathManager:
     """
 
     manual_path = importlib.resources.files("data") / "manuel.pdf"
+    # Answers of all the sessions, next to the options file.
+    responses_path = Path("responses.csv")
+    # Generated files (thumbnail atlases, etc.), next to the options file.
+    cache_dir = Path("cache")
+    # Click-to-sound latency histogram, written at exit when measure_latency is set.
+    latency_report_path = Path("latency.txt")
 
     @staticmethod
     def get_image_path(word: str) -> Path:
@@ -59,6 +79,12 @@ class PathManager:
         file_path = importlib.resources.files("data") / "sounds" / f"{word}.wav"
         return file_path
 
+    @staticmethod
+    def get_success_sound_paths() -> list:
+        """Gets the paths to the sound files of the 'success' sounds directory."""
+        sounds_dir = importlib.resources.files("data") / "sounds" / "success"
+        return [f for f in sounds_dir.iterdir() if f.is_file() and f.suffix.lower() == ".wav"]
+
     @staticmethod
     def file_exists(file_path: Path) -> None:
         """Checks if a file exists at the given path."""
@@ -66,19 +92,6 @@ class PathManager:
             print(f"{file_path} does not exist.")
 
 
-class CurrentItem:
-    """Store current item info."""
-
-    def __init__(self, word1: str, word2: str, audio: str):
-        """Init."""
-
-        self.word1 = word1
-        self.word2 = word2
-        self.audio = audio
-        self.score = 0
-        self.total_attempts = 0
-
-
 class AboutDialog(QDialog):
     """
     Creates and displays an about window with information about the software, author, and
@@ -140,27 +153,53 @@ class AboutDialog(QDialog):
 
 class SmoothImageLabel(QLabel):
     """A QLabel subclass that smoothly scales its QPixmap.
-    It's needed because big images are aliased when they are resized smaller."""
+    It's needed because big images are aliased when they are resized smaller.
+    With a cache, the source image is taken from the shared AssetCache and released when the
+    label shows another image."""
 
-    def __init__(self, image_path: str, width: int, height: int, *args, **kwargs):
+    def __init__(self, image_path: str, width: int, height: int, *args, cache=None, **kwargs):
         """Initialize the SmoothImageLabel with an image and dimensions."""
         super().__init__(*args, **kwargs)
-        self.image_path = image_path
-        self.pixmap = QPixmap(self.image_path)
+        self.cache = cache
+        self.image_path = None
+        self.source = None
         self.width = width
         self.height = height
-        self.set_image(self.image_path, self.width, self.height)
+        self.set_image(image_path, self.width, self.height)
 
     def set_image(self, image_path: str, width: int, height: int):
-        """Set the image and resize it according to the given width and height."""
-        self.image_path = image_path
+        """Set the image and resize it according to the given width and height.
+        The source image is only decoded when the path changes, not on every resize."""
+        if image_path != self.image_path:
+            self.release_image()
+            if self.cache is not None:
+                self.source = self.cache.acquire("image", image_path)
+            else:
+                self.source = QPixmap(str(image_path))
+            self.image_path = image_path
         self.width = width
         self.height = height
-        self.pixmap = QPixmap(self.image_path)
-        self.pixmap = self.pixmap.scaled(self.width, self.height,
+        self.pixmap = self.source.scaled(self.width, self.height,
                                          Qt.KeepAspectRatio, Qt.SmoothTransformation)
         self.setPixmap(self.pixmap)
 
+    def reload_image(self):
+        """The source file changed: take the new image (decoded again by the cache)."""
+        if self.image_path is None:
+            return
+        if self.cache is not None:
+            self.source = self.cache.get("image", self.image_path)
+        else:
+            self.source = QPixmap(str(self.image_path))
+        self.set_image(self.image_path, self.width, self.height)
+
+    def release_image(self):
+        """Give the source image back to the cache."""
+        if self.cache is not None and self.image_path is not None:
+            self.cache.release("image", self.image_path)
+        self.image_path = None
+        self.source = None
+
 
 class CheckBoxMenuItem(QWidget):
     """A custom menu item with a checkbox.
@@ -196,7 +235,12 @@ class OptionsManager:
             options = {"random_order": True,
                        "auto_listen": True,
                        "success_sound": True,
-                       "hide_next_button": True}
+                       "hide_next_button": True,
+                       "audio_backend": "soundeffect",
+                       "audio_buffer_ms": 20,
+                       "measure_latency": False,
+                       "difficulty_order": False,
+                       "child": ""}
         return options
 
     def save_options(self):
@@ -214,19 +258,250 @@ class OptionsManager:
         self.options[key] = value
 
 
-class MainWindow(QMainWindow):
-    """Main window."""
+class SharedResources(QObject):
+    """What the practice windows of the process share: decoded images and sounds, and the audio
+    output. Each window keeps its own item, options and scheduling."""
 
     def __init__(self):
-        """Initialization."""
+        """Init."""
         super().__init__()
+        self.cache = AssetCache()
+        self.cache.register_loader("image", lambda path: QPixmap(str(path)))
+        self.cache.register_loader("sound", load_pcm)
+        self.audio = None
+        self.audio_name = None
+        # Sounds waiting for the output, from all the windows: (window, file), and the window whose
+        # sound is playing. The next sound starts when the timer sees the current one ended.
+        self.sound_queue = deque()
+        self.audio_owner = None
+        self.sound_timer = QTimer(self)
+        self.sound_timer.timeout.connect(self.check_sound)
+        self.latency_probe = None
+        self.windows = []
+        # The corpus, replaced when pairs.py is edited while the application runs.
+        self.corpus = pairs
+        self.corpus_index = None
+        self.watcher = None
+        # Converts the sounds to the format of the output device, if enabled.
+        self.converter = None
+
+    def set_audio_backend(self, name: str, buffer_ms: float = 20):
+        """Switch the audio output: "soundeffect" (QSoundEffect), "sink" (QAudioSink with a small
+        buffer) or "null". It is switched for all the windows, whose options follow."""
+        if self.audio is not None:
+            if name == self.audio_name:
+                return
+            self.audio.stop()
+        self.audio = create_backend(name, buffer_ms=buffer_ms, probe=self.latency_probe,
+                                    cache=self.cache, converter=self.converter)
+        self.audio_name = name
+        if self.converter is not None:
+            self.converter.keep_clips(self.audio.uses_pcm)
+        for window in self.windows:
+            window.follow_audio_backend()
+
+    def needs_pcm(self, path: Path) -> bool:
+        """Whether a sound is to be held decoded in the cache: only for backends playing PCM, and
+        until the converter has it in the format of the device. QSoundEffect reads the files."""
+        if self.audio is None or not self.audio.uses_pcm:
+            return False
+        return self.converter is None or self.converter.converted_clip(path) is None
+
+    def queue_sound(self, window: "MainWindow", file: Path):
+        """Play a sound once the sounds queued before, by any window, have been heard. The input
+        gate of the window stays closed until then."""
+        window.input_gate.close()
+        self.sound_queue.append((window, file))
+        self.play_next_sound()
+
+    def play_next_sound(self):
+        """Start the next queued sound if none is playing. Sounds ending at once (null backend)
+        are done without waiting for the timer."""
+        while self.sound_queue and self.audio_owner is None:
+            window, file = self.sound_queue.popleft()
+            self.audio_owner = window
+            self.audio.play(file)
+            if self.audio.is_playing():
+                self.sound_timer.start(max(1, int(self.audio.poll_interval * 1000)))
+                return
+            self.sound_done()
+
+    def check_sound(self):
+        """Timer: go to the next sound when the current one has been heard."""
+        if self.audio.is_playing():
+            return
+        self.sound_timer.stop()
+        self.sound_done()
+        self.play_next_sound()
+
+    def sound_done(self):
+        """The sound of a window has been heard: open its gate again, which may queue more."""
+        window, self.audio_owner = self.audio_owner, None
+        window.input_gate.open()
+
+    def cancel_sounds(self, window: "MainWindow"):
+        """Forget the queued sounds of a closed window."""
+        self.sound_queue = deque((owner, file) for owner, file in self.sound_queue
+                                 if owner is not window)
+
+    def enable_latency_probe(self):
+        """Start timestamping the clicks to measure click-to-sound latency."""
+        if self.latency_probe is not None:
+            return
+        self.latency_probe = LatencyProbe()
+        if self.audio is not None:
+            self.audio.probe = self.latency_probe
+
+    def mark_input(self):
+        """A click which may play a sound, in the latency measurement mode. Marked by the slots of
+        the clicks, when Qt delivers them (on release for the buttons and the lists), so that the
+        time the mouse button is held down is not counted."""
+        if self.latency_probe is not None:
+            self.latency_probe.mark_input()
+
+    def write_latency_report(self):
+        """Write the latency histogram to a file: the standard output of the Windows executable
+        is not visible."""
+        if self.latency_probe is not None:
+            PathManager.latency_report_path.write_text(self.latency_probe.report() + "\n",
+                                                       encoding="utf-8")
+
+    def convert_audio_for_device(self):
+        """Query the format of the output device once, and convert the prompts and the success
+        sounds to it ahead of time; the words follow the categories selected in the windows."""
+        self.converter = AudioConverter.for_device(PathManager.cache_dir / "audio")
+        if self.converter is None:
+            return
+        self.converter.keep_clips(self.audio is not None and self.audio.uses_pcm)
+        if self.audio is not None:
+            self.audio.converter = self.converter
+        self.converter.prepare([PathManager.get_sound_path(sound)
+                                for sound in MainWindow.PROMPT_SOUNDS]
+                               + PathManager.get_success_sound_paths(), fixed=True)
+        self.prepare_audio()
+
+    def prepare_audio(self):
+        """Have the sounds of the categories selected in the windows converted."""
+        if self.converter is None:
+            return
+        self.converter.prepare({PathManager.get_sound_path(word)
+                                for window in self.windows
+                                for pair in window.engine.category_pairs for word in pair})
+
+    def watch_corpus(self, force_polling: bool = False):
+        """Reload the corpus and the pictures and sounds when their files change."""
+        data_dir = importlib.resources.files("data")
+        self.corpus_index = CorpusIndex(self.corpus)
+        self.watcher = CorpusWatcher(Path(sys.modules["pairs"].__file__), self.corpus,
+                                     {"image": (data_dir / "images", ".png"),
+                                      "sound": (data_dir / "sounds", ".wav")},
+                                     force_polling=force_polling, parent=self)
+        self.watcher.corpusChanged.connect(self.on_corpus_changed)
+        self.watcher.corpusError.connect(self.on_corpus_error)
+        self.watcher.assetChanged.connect(self.on_asset_changed)
+
+    def on_corpus_changed(self, corpus: list, diff):
+        """pairs.py was edited: re-index and update the windows for the changed categories."""
+        self.show_status(f"Liste des mots rechargée : {len(diff.added)} catégorie(s) ajoutée(s), "
+                         f"{len(diff.removed)} supprimée(s), {len(diff.changed)} modifiée(s).")
+        self.corpus_index.update(self.corpus, corpus, diff)
+        self.corpus = corpus
+        for label in diff.removed + diff.changed:
+            invalidate_atlas(label, PathManager.cache_dir / "atlas")
+        for window in self.windows:
+            window.apply_corpus(corpus, diff)
+        self.prepare_audio()
+
+    def on_corpus_error(self, message: str):
+        """pairs.py could not be loaded: the previous words stay in use until it is fixed."""
+        self.show_status(f"pairs.py n'a pas été rechargé, la liste précédente reste utilisée. "
+                         f"{message}", timeout=0)
+
+    def show_status(self, message: str, timeout: int = 10000):
+        """Show a message in the status bar of every window (timeout in ms, 0 to keep it)."""
+        for window in self.windows:
+            window.statusBar().showMessage(message, timeout)
+
+    def on_asset_changed(self, kind: str, word: str):
+        """A picture or a sound was added, modified or removed: decode it again if it is in use,
+        and drop the atlases showing it."""
+        if kind == "image":
+            path = PathManager.get_image_path(word)
+            if self.cache.invalidate(kind, path):
+                for window in self.windows:
+                    for label in (window.image_label1, window.image_label2):
+                        if label.image_path == path:
+                            label.reload_image()
+            for label in self.corpus_index.categories_of(word):
+                invalidate_atlas(label, PathManager.cache_dir / "atlas")
+        else:
+            self.cache.invalidate(kind, PathManager.get_sound_path(word))
+            if self.converter is not None:
+                self.converter.invalidate(PathManager.get_sound_path(word))
+
+    def new_window(self) -> "MainWindow":
+        """Open a new practice session, numbered with the lowest free number."""
+        used = {window.session for window in self.windows}
+        session = min(set(range(1, len(self.windows) + 2)) - used)
+        window = MainWindow(shared=self, session=session)
+        window.show()
+        return window
+
+    def tile_windows(self):
+        """Put the windows side by side on the screen."""
+        screen_size = QApplication.primaryScreen().availableGeometry()
+        width = screen_size.width() // max(1, len(self.windows))
+        for index, window in enumerate(self.windows):
+            window.setGeometry(screen_size.x() + index * width, screen_size.y(),
+                               width, screen_size.height())
 
-        self.current_sound = QSoundEffect()
+
+class MainWindow(QMainWindow):
+    """Main window. One window is one practice session; several can run side by side in the same
+    process, sharing the SharedResources."""
+
+    # Sounds held for the whole session.
+    PROMPT_SOUNDS = (ExerciseEngine.THIS_IS_SOUND, ExerciseEngine.SHOW_ME_SOUND)
+
+    def __init__(self, shared: SharedResources = None, session: int = 1, seed: int = None,
+                 options_file: str = None):
+        """Initialization.
+        seed: seed of the random choices of the session (pair shuffling, next pair, success
+        sound), random if None. Recorded traces keep it to be replayed identically.
+        options_file: defaults to options.json, options_<session>.json for the other sessions."""
+        super().__init__()
+
+        self.shared = shared if shared is not None else SharedResources()
+        self.session = session
+        self.shared.windows.append(self)
         self.current_item = None
-        self.pairs = pairs  # From 'pairs' package.
+        self.pairs = self.shared.corpus  # From 'pairs' package, or its reloaded version.
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.engine = ExerciseEngine(self.pairs, rng=random.Random(self.seed))
+        # Receives the user inputs when the session is recorded (see replay.py).
+        self.event_log = None
+        if options_file is None:
+            options_file = "options.json" if session == 1 else f"options_{session}.json"
+        self.options_file = options_file
+        # Inputs are dropped or coalesced while a sound is playing.
+        # Each list has its own slot: a click on one must not replace a click on the other.
+        self.input_gate = InputGate(coalesce_kinds=("list_a", "list_b"))
+        self.input_gate.on_release = self.on_input_released
+        # Sounds taken from the shared cache when the audio output plays decoded PCM (see
+        # hold_sounds): prompts and success sounds for the session, words for the item.
+        self.session_sounds = ([PathManager.get_sound_path(sound) for sound in self.PROMPT_SOUNDS]
+                               + PathManager.get_success_sound_paths())
+        self.prompt_assets = AssetSet(self.shared.cache)
+        self.item_assets = AssetSet(self.shared.cache)
+        # Worksheet export running in the background, and its progress dialog.
+        self.worksheet_export = None
+        self.worksheet_progress = None
 
         # Set title and icon.
-        self.setWindowTitle(f"{SoftwareInfo.NAME} {SoftwareInfo.VERSION}")
+        title = f"{SoftwareInfo.NAME} {SoftwareInfo.VERSION}"
+        if session > 1:
+            title += f" - Session {session}"
+        self.setWindowTitle(title)
         icon_path = importlib.resources.files("data") / "app_icon.png"
         icon = QIcon(str(icon_path))
         self.setWindowIcon(icon)
@@ -254,7 +529,12 @@ class MainWindow(QMainWindow):
         """Loads options from the json options file and apply them."""
         # Load options.
         # Set up OptionsManager and get checkboxes state.
-        self.options_manager = OptionsManager("options.json")
+        # Each session has its own options file.
+        self.options_manager = OptionsManager(self.options_file)
+        # Checking a box saves the state of all of them: the options not restored yet would be
+        # overwritten. The boxes are restored silently and the options applied below.
+        for item in self.option_checkboxes.values():
+            item.checkbox.blockSignals(True)
         self.opt_random.checkbox.setChecked(
             self.options_manager.get_option("random_order", True))
         self.opt_auto_listen.checkbox.setChecked(
@@ -263,10 +543,32 @@ class MainWindow(QMainWindow):
             self.options_manager.get_option("success_sound", True))
         self.opt_hide_next_button.checkbox.setChecked(
             self.options_manager.get_option("hide_next_button", True))
+        self.opt_low_latency.checkbox.setChecked(
+            self.options_manager.get_option("audio_backend", "soundeffect") == "sink")
+        self.opt_difficulty.checkbox.setChecked(
+            self.options_manager.get_option("difficulty_order", False))
+        for item in self.option_checkboxes.values():
+            item.checkbox.blockSignals(False)
 
         # Apply options.
         # Handle Hide Next Button option.
         self.toggle_hide_next_button(state=self.opt_hide_next_button.checkbox.isChecked())
+        # Handle audio backend and latency measurement options.
+        if self.options_manager.get_option("measure_latency", False):
+            self.shared.enable_latency_probe()
+        # The audio output is shared: a window opened later takes the current one.
+        if self.audio is None:
+            self.set_audio_backend(
+                self.options_manager.get_option("audio_backend", "soundeffect"))
+        else:
+            self.follow_audio_backend()
+        # Handle Easy To Hard option.
+        if self.opt_difficulty.checkbox.isChecked():
+            self.set_difficulty_order(True)
+        # Answers are recorded for the child of the last session.
+        self.recorder = ResponseRecorder(PathManager.responses_path,
+                                         child=self.options_manager.get_option("child", ""),
+                                         window=self.session)
 
     def init_ui(self):
         """Contains the window's widgets."""
@@ -337,6 +639,55 @@ class MainWindow(QMainWindow):
         # Action when un/checked.
         self.opt_hide_next_button.checkbox.stateChanged.connect(self.toggle_hide_next_button)
 
+        # Create a custom widget with a QCheckBox for the "Low Latency Audio" option.
+        self.opt_low_latency = CheckBoxMenuItem("Sortie audio à faible latence", self)
+        self.opt_low_latency.checkbox.stateChanged.connect(self.save_options_to_file)
+        # Create a QWidgetAction, set the custom widget, and add it to the "Options" menu.
+        opt_low_latency_widget_action = QWidgetAction(self)
+        opt_low_latency_widget_action.setDefaultWidget(self.opt_low_latency)
+        options_menu.addAction(opt_low_latency_widget_action)
+        # Action when un/checked.
+        self.opt_low_latency.checkbox.stateChanged.connect(
+            lambda state: self.set_audio_backend("sink" if state else "soundeffect"))
+
+        # Create a custom widget with a QCheckBox for the "Easy To Hard" option.
+        self.opt_difficulty = CheckBoxMenuItem("Paires de la plus facile à la plus difficile", self)
+        self.opt_difficulty.checkbox.stateChanged.connect(self.save_options_to_file)
+        # Create a QWidgetAction, set the custom widget, and add it to the "Options" menu.
+        opt_difficulty_widget_action = QWidgetAction(self)
+        opt_difficulty_widget_action.setDefaultWidget(self.opt_difficulty)
+        options_menu.addAction(opt_difficulty_widget_action)
+        # Action when un/checked.
+        self.opt_difficulty.checkbox.stateChanged.connect(
+            lambda state: self.set_difficulty_order(bool(state)))
+
+        # Option toggles are user inputs too.
+        self.option_checkboxes = {"random_order": self.opt_random,
+                                  "auto_listen": self.opt_auto_listen,
+                                  "success_sound": self.opt_success_sound,
+                                  "hide_next_button": self.opt_hide_next_button,
+                                  "low_latency": self.opt_low_latency,
+                                  "difficulty_order": self.opt_difficulty}
+        for key, item in self.option_checkboxes.items():
+            item.checkbox.stateChanged.connect(
+                lambda state, key=key: self.log_event("option", key=key, value=bool(state)))
+
+        # Create a "New Session" action to practice with another child side by side.
+        session_action = menu_bar.addAction("Nouvelle session")
+        session_action.triggered.connect(self.shared.new_window)
+        # Create an "Overview" action to see all the pairs of the category at once.
+        overview_action = menu_bar.addAction("Aperçu")
+        overview_action.triggered.connect(self.show_category_overview)
+        # Create a "Worksheets" action to print the pairs of the category for practice at home.
+        worksheet_action = menu_bar.addAction("Fiches")
+        worksheet_action.triggered.connect(self.export_worksheet)
+        # Create a "Child" action to name the child whose answers are recorded.
+        child_action = menu_bar.addAction("Enfant")
+        child_action.triggered.connect(self.ask_child_name)
+        # Create a "Statistics" action to show the analytics of the recorded answers.
+        stats_action = menu_bar.addAction("Statistiques")
+        stats_action.triggered.connect(
+            lambda: AnalyticsDialog(PathManager.responses_path, parent=self).show())
         # Create a Help menu and add it to the menu bar.
         help_action = menu_bar.addAction("Manuel")
         help_action.triggered.connect(lambda: self.open_pdf(PathManager.manual_path))
@@ -356,10 +707,10 @@ class MainWindow(QMainWindow):
         self.empty_widget.hide()
         self.list_a = QListWidget()
         self.list_a.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Expanding)
-        self.list_a.itemClicked.connect(self.update_list_b)
+        self.list_a.itemClicked.connect(self.on_list_a_clicked)
         self.list_b = QListWidget()
         self.list_b.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Expanding)
-        self.list_b.itemClicked.connect(self.handle_list_b_click)
+        self.list_b.itemClicked.connect(self.on_list_b_clicked)
 
         self.toggle_button = QPushButton("Afficher/masquer")
         self.toggle_button.clicked.connect(self.toggle_lists)
@@ -379,8 +730,8 @@ class MainWindow(QMainWindow):
         """Initialize the images and the "Listen" button."""
 
         image_null = PathManager.get_image_path("_null")
-        self.image_label1 = SmoothImageLabel(image_null, 10, 10)
-        self.image_label2 = SmoothImageLabel(image_null, 10, 10)
+        self.image_label1 = SmoothImageLabel(image_null, 10, 10, cache=self.shared.cache)
+        self.image_label2 = SmoothImageLabel(image_null, 10, 10, cache=self.shared.cache)
         self.image_label1.setAlignment(Qt.AlignCenter)
         self.image_label2.setAlignment(Qt.AlignCenter)
         self.image_label1.mousePressEvent = self.image_label1_clicked
@@ -395,7 +746,8 @@ class MainWindow(QMainWindow):
         self.listen_button.setFixedWidth(120)
         self.next_button = QPushButton(" > ")
         self.next_button.setFixedHeight(40)
-        self.next_button.clicked.connect(self.next_item)
+        self.listen_button.clicked.connect(self.on_listen_clicked)
+        self.next_button.clicked.connect(self.on_next_clicked)
 
         listen_button_layout = QHBoxLayout()
         listen_button_layout.addStretch()
@@ -456,6 +808,7 @@ class MainWindow(QMainWindow):
         """Handle the window resize event."""
 
         super().resizeEvent(event)
+        self.log_event("resize", width=event.size().width(), height=event.size().height())
         self.resize_images()
 
     def toggle_lists(self):
@@ -479,22 +832,81 @@ class MainWindow(QMainWindow):
         else:  # Checkbox unchecked.
             self.next_button.show()
 
+    @property
+    def audio(self):
+        """The audio output, shared by all the windows."""
+        return self.shared.audio
+
+    def set_audio_backend(self, name: str):
+        """Switch the audio output (see SharedResources.set_audio_backend)."""
+        buffer_ms = self.options_manager.get_option("audio_buffer_ms", 20)
+        self.shared.set_audio_backend(name, buffer_ms)
+
+    def follow_audio_backend(self):
+        """The shared audio output was switched, maybe by another window: update the option and
+        hold the sounds it needs."""
+        name = self.shared.audio_name
+        self.opt_low_latency.checkbox.blockSignals(True)
+        self.opt_low_latency.checkbox.setChecked(name == "sink")
+        self.opt_low_latency.checkbox.blockSignals(False)
+        if self.options_manager.get_option("audio_backend", "soundeffect") != name:
+            self.options_manager.set_option("audio_backend", name)
+            self.options_manager.save_options()
+        self.hold_sounds()
+
+    def hold_sounds(self):
+        """Hold the sounds the session may play in the shared cache, when they are needed decoded
+        (see SharedResources.needs_pcm): the prompts and success sounds, and both words of the item
+        (the wrong one is played back on errors)."""
+        self.prompt_assets.replace({("sound", path) for path in self.session_sounds
+                                    if self.shared.needs_pcm(path)})
+        words = ((self.current_item.word1, self.current_item.word2)
+                 if self.current_item is not None else ())
+        paths = [PathManager.get_sound_path(word) for word in words]
+        self.item_assets.replace({("sound", path) for path in paths
+                                  if self.shared.needs_pcm(path)})
+
+    def closeEvent(self, event):
+        """Give the assets of the session back to the shared cache."""
+        self.image_label1.release_image()
+        self.image_label2.release_image()
+        self.item_assets.clear()
+        self.prompt_assets.clear()
+        self.shared.cancel_sounds(self)
+        # The export thread belongs to the window: let it finish the file.
+        if self.worksheet_export is not None:
+            self.worksheet_export.wait()
+        if self in self.shared.windows:
+            self.shared.windows.remove(self)
+        self.shared.prepare_audio()
+        super().closeEvent(event)
+
     def populate_list_a(self):
         """Populate the first list (A) with pair category ("p / b", etc.)."""
-        for pair in self.pairs:
-            item = QListWidgetItem(pair[0].replace("_", " / "))
+        for label in self.engine.categories():
+            item = QListWidgetItem(label.replace("_", " / "))
             self.list_a.addItem(item)
 
     def update_list_b(self, item):
         """Update the second list (B) with pairs of a category ("pain / bain", etc.)."""
 
+        self.show_category(item)
+
+        # Select the first item in List B automatically.
+        if self.list_b.count() > 0:
+            first_item = self.list_b.item(0)
+            self.list_b.setCurrentItem(first_item)
+            self.handle_list_b_click(first_item)
+
+    def show_category(self, item):
+        """Select the category of an item of List A and show its pairs in List B, without
+        presenting one."""
+
         # Find the corresponding pair.
         pair_label = item.text().replace(" / ", "_")
-        pair_data = None
-        for pair in self.pairs:
-            if pair[0] == pair_label:
-                pair_data = pair[1:]
-                break
+        pair_data = self.engine.select_category(pair_label)
+        # Convert the sounds of the category to the format of the device meanwhile.
+        self.shared.prepare_audio()
 
         # Clear List B and update it with the new word pairs.
         if pair_data:
@@ -503,100 +915,175 @@ class MainWindow(QMainWindow):
                 formatted_pair = f"{word_pair[0]} / {word_pair[1]}"
                 self.list_b.addItem(formatted_pair)
 
-        # Select the first item in List B automatically.
-        if self.list_b.count() > 0:
-            first_item = self.list_b.item(0)
-            self.list_b.setCurrentItem(first_item)
-            self.handle_list_b_click(first_item)
+    def choose_default_category(self):
+        """Select the selected or the first category of List A, for the actions needing one
+        before any was clicked. Not through the input gate, which may coalesce it away while a
+        sound plays, and no pair is presented, so that no sound starts."""
+        item = self.list_a.currentItem() or self.list_a.item(0)
+        if item is None:
+            return
+        self.log_event("category", row=self.list_a.row(item))
+        self.list_a.setCurrentItem(item)
+        self.show_category(item)
+
+    def apply_corpus(self, corpus: list, diff):
+        """Take a new version of the corpus (see SharedResources.watch_corpus). Lists A and B are
+        updated in place; the session goes on with the current pair if it still exists."""
+        self.pairs = corpus
+        category = self.engine.category
+        if self.opt_difficulty.checkbox.isChecked():
+            self.engine.difficulty = load_difficulty(corpus, PathManager.cache_dir)
+        self.engine.update_corpus(corpus)
+
+        # List A: remove and insert the categories, the others keeping their items.
+        labels = self.engine.categories()
+        for row in reversed(range(self.list_a.count())):
+            if self.list_a.item(row).text().replace(" / ", "_") not in labels:
+                self.list_a.takeItem(row)
+        for row, label in enumerate(labels):
+            if label in diff.added:
+                self.list_a.insertItem(row, QListWidgetItem(label.replace("_", " / ")))
+
+        # List B: only if its category changed.
+        if category is None or category not in diff.removed + diff.changed:
+            return
+        self.list_b.clear()
+        for word_pair in self.engine.category_pairs:
+            self.list_b.addItem(f"{word_pair[0]} / {word_pair[1]}")
+        if self.engine.row != -1:
+            self.list_b.setCurrentRow(self.engine.row)
+        elif self.list_b.count() > 0:
+            # The current pair was removed: go on with the first one.
+            self.list_b.setCurrentRow(0)
+            self.handle_list_b_click(self.list_b.item(0))
+
+    def set_difficulty_order(self, enabled: bool):
+        """Order the pairs of List B from the easiest to the hardest and present them in that
+        order, or as in the corpus."""
+        # The scores are cached with the corpus: computed again only when it changes.
+        self.engine.set_difficulty(
+            load_difficulty(self.pairs, PathManager.cache_dir) if enabled else None)
+        # The pairs are then presented in that order: random order does not apply.
+        self.opt_random.checkbox.setEnabled(not enabled)
+        if self.engine.category is None:
+            return
+        # Reorder List B in place, the current pair staying selected.
+        self.list_b.clear()
+        for word_pair in self.engine.category_pairs:
+            self.list_b.addItem(f"{word_pair[0]} / {word_pair[1]}")
+        if self.engine.row != -1:
+            self.list_b.setCurrentRow(self.engine.row)
 
     def handle_list_b_click(self, item):
         """Handle the click event on a word pair in List B. Update the displayed images and prepare
         the audio file to be played by the "Listen" button."""
 
-        # Get the image and audio names from the clicked item in List B.
-        pair = item.text().split(" / ")
-        # Word are shuffled so not always the same image at the same place.
-        random.shuffle(pair)
-        # Pick a random word as good response, which will be pronounced (audio).
-        audio = random.choice(pair)
-        # Store this in current item.
-        self.current_item = CurrentItem(pair[0], pair[1], audio)
+        # The engine shuffles the pair and picks the word which will be pronounced (audio).
+        self.current_item = self.engine.select_row(self.list_b.row(item))
         # Set paths.
         audio_path = PathManager.get_sound_path(self.current_item.audio)
         image1_path = PathManager.get_image_path(self.current_item.word1)
         image2_path = PathManager.get_image_path(self.current_item.word2)
+        self.hold_sounds()
 
         # Update the image labels with the new images.
         self.image_label1.set_image(image1_path, 0, 0)
         self.image_label2.set_image(image2_path, 0, 0)
         self.resize_images()
-        # Update the audio playback function of the "Listen" button.
-        try:
-            self.listen_button.clicked.disconnect()
-        except RuntimeError:
-            pass
-        self.listen_button.clicked.connect(lambda: self.play_audio(audio_path))
 
         # Play the audio automatically if the "Automatic Listening" option is checked.
         if self.opt_auto_listen.checkbox.isChecked():
             self.play_audio(audio_path)
 
+    def log_event(self, name: str, **fields):
+        """Pass a user input to the session recorder, if any."""
+        if self.event_log is not None:
+            self.event_log.log(name, **fields)
+
+    def submit_input(self, kind: str, callback, *args, **fields):
+        """Record a user input with what the input gate does with it, then pass it to the gate.
+        Coalesced inputs are recorded again, as released, when they finally run."""
+        self.log_event(kind, gate=self.input_gate.outcome(kind), **fields)
+        self.input_gate.submit(kind, callback, *args)
+
+    def on_input_released(self, kind: str, args: tuple):
+        """A coalesced list click runs now that the feedback is over."""
+        self.log_event(kind, gate="released", row=args[0])
+
+    def on_list_a_clicked(self, item):
+        """When a category is clicked in List A."""
+        self.shared.mark_input()
+        row = self.list_a.row(item)
+        # The row is queued, not the item, which the list may delete before the gate opens.
+        self.submit_input("list_a", self.select_list_a_row, row, row=row)
+
+    def on_list_b_clicked(self, item):
+        """When a pair is clicked in List B."""
+        self.shared.mark_input()
+        row = self.list_b.row(item)
+        self.submit_input("list_b", self.select_list_b_row, row, row=row)
+
+    def select_list_a_row(self, row: int):
+        """Show the category at a row of List A, if it is still there."""
+        item = self.list_a.item(row)
+        if item is not None:
+            self.update_list_b(item)
+
+    def select_list_b_row(self, row: int):
+        """Present the pair at a row of List B, if it is still there."""
+        item = self.list_b.item(row)
+        if item is not None:
+            self.list_b.setCurrentItem(item)
+            self.handle_list_b_click(item)
+
+    def on_listen_clicked(self):
+        """When the "Listen" button is clicked: play the word of the current item."""
+        self.shared.mark_input()
+        if self.current_item is not None:
+            audio_path = PathManager.get_sound_path(self.current_item.audio)
+            self.submit_input("listen", self.play_audio, audio_path)
+
+    def on_next_clicked(self):
+        """When the "Next" button is clicked."""
+        self.shared.mark_input()
+        self.submit_input("next", self.next_item)
+
     def image_label1_clicked(self, event):
         """When Image1 is clicked."""
         self.event = event
+        self.shared.mark_input()
         if self.current_item is not None:
-            self.check_answer(self.current_item.word1)
+            self.submit_input("image", self.check_answer, self.current_item.word1, image=1)
 
     def image_label2_clicked(self, event):
         """When Image2 is clicked."""
         self.event = event
+        self.shared.mark_input()
         if self.current_item is not None:
-            self.check_answer(self.current_item.word2)
+            self.submit_input("image", self.check_answer, self.current_item.word2, image=2)
 
     def check_answer(self, selected_word):
-        """Check if clicked image corresponds to audio."""
+        """Check if clicked image corresponds to audio.
+        The input gate stays closed for the whole feedback, including between two sounds, which
+        are queued one after another."""
 
-        # self.set_ui_state("disabled")
-
-        if self.current_item is None:
-            return None
-
-        correct_word = self.current_item.audio
-
-        if selected_word == correct_word:
-            self.current_item.score += 1
-            # FIXME
-            if self.opt_success_sound.checkbox.isChecked():
-                success_sound = self.get_random_success_sound()
-                self.play_audio(success_sound)
-                # Wait for the sound to finish.
-                while self.current_sound.isPlaying():
-                    QApplication.processEvents()
-                    time.sleep(0.1)
+        result = self.engine.answer(selected_word)
+        if result is None:
+            return
+        self.recorder.record(result)
+
+        with self.input_gate.closed():
+            if result.correct:
+                if self.opt_success_sound.checkbox.isChecked():
+                    success_sound = self.get_random_success_sound()
+                    self.play_audio(success_sound)
+                # Go to next item, once the success sound has been heard.
+                self.input_gate.when_open(self.next_item)
+            # If erroneous response.
             else:
-                #QMessageBox.information(self, "Bravo!", f"La réponse est correcte: {correct_word}")
-                pass
-            # Go to next item.
-            self.next_item()
-        # If erroneous response.
-        else:
-            #QMessageBox.warning(self, "Erreur", f"La réponse est incorrecte. La bonne réponse est : {correct_word}")
-            # Sound : "This is..."
-            this_is_sound = PathManager.get_sound_path("_ça c'est")
-            self.play_audio(this_is_sound)
-            # Sound : the wrong word, which completes "This is...".
-            wrong_word = selected_word
-            wrong_sound = PathManager.get_sound_path(wrong_word)
-            self.play_audio(wrong_sound)
-            # Sound : "Show me..."
-            show_me_sound = PathManager.get_sound_path("_montre moi")
-            self.play_audio(show_me_sound)
-            # Sound : the word we ask.
-            correct_word_sound = PathManager.get_sound_path(correct_word)
-            self.play_audio(correct_word_sound)
-
-        self.current_item.total_attempts += 1
-        # self.set_ui_state("enabled")
+                # "This is..." + the wrong word, then "Show me..." + the word we ask.
+                for sound in self.engine.feedback_sounds(result):
+                    self.play_audio(PathManager.get_sound_path(sound))
 
     def next_item(self):
         """Go to next item : next in list B or random in list B.
@@ -606,79 +1093,23 @@ class MainWindow(QMainWindow):
         if self.list_b.currentRow() == -1:
             return
 
-        if self.opt_random.checkbox.isChecked():
-            current_row = self.list_b.currentRow()
-            new_row = current_row
-
-            # Chooses a new random row different from the current one.
-            while new_row == current_row:
-                new_row = random.randint(0, self.list_b.count() - 1)
-
-            self.list_b.setCurrentRow(new_row)
-        else:
-            # If the current item is the last one, loop back to the first item.
-            if self.list_b.currentRow() == self.list_b.count() - 1:
-                self.list_b.setCurrentRow(0)
-            else:
-                # Otherwise, just move to the next item.
-                self.list_b.setCurrentRow(self.list_b.currentRow() + 1)
-
-        self.list_b.itemClicked.emit(self.list_b.currentItem())
-
-    def set_ui_state(self, state: str):
-        """Enable or disable important parts of UI.
-        Purpose : not having a child clicking 100 times on a button which produces 100 sounds."""
-
-        widgets = [self.listen_button, self.next_button,
-                   self.list_a, self.list_b,
-                   self.image_label1, self.image_label2]
-
-        if state == "enabled":
-            for w in widgets:
-                w.setEnabled(True)
-                # w.blockSignals(False)  # Works bad.
-            print("UI enabled")
-
-        if state == "disabled":
-            for w in widgets:
-                w.setEnabled(False)
-                # w.blockSignals(True)
-            print("UI disabled")
+        new_row = self.engine.next_row(random_order=self.opt_random.checkbox.isChecked())
+        self.list_b.setCurrentRow(new_row)
+        self.handle_list_b_click(self.list_b.currentItem())
 
     def play_audio(self, file: Path):
-        """Play an audio file.
-        WARNING : Add this line into the __init__ of the QMainWindow, else sound will be stopped
-        when the function ends (so fast we won't hear anything).
-            self.current_sound = None
-        """
-        self.set_ui_state("disabled")
-        # Do nothing if sound is already playing.
-        while self.current_sound.isPlaying():
-            return
-            # QApplication.processEvents()
-            # time.sleep(0.1)
-
+        """Play an audio file, after the sounds queued before by this window or the others: the
+        output is shared (see SharedResources.queue_sound). Returns at once; inputs received
+        until the sound has been heard are dropped or coalesced by the gate."""
         print(f"Play {file}.")
-        # Reinit sound an set source file.
-        self.current_sound = QSoundEffect()
-        self.current_sound.setSource(QUrl.fromLocalFile(file))
-        # Start playing the sound.
-        self.current_sound.setVolume(1)
-        self.current_sound.play()
-
-        # Wait for the sound to end.
-        while self.current_sound.isPlaying():
-            QApplication.processEvents()
-            time.sleep(0.1)
-        self.set_ui_state("enabled")
+        self.shared.queue_sound(self, file)
 
     def get_random_success_sound(self) -> Path:
         """Return a random success sound file from the 'success' sounds directory."""
-        sounds_dir = importlib.resources.files("data") / "sounds" / "success"
-        files = [f for f in sounds_dir.iterdir() if f.is_file() and f.suffix.lower() == ".wav"]
+        files = PathManager.get_success_sound_paths()
         # If no sound files in folder (should be impossible) FIXME.
         if not files == []:
-            random_sound = random.choice(files)
+            random_sound = self.engine.rng.choice(files)
             return random_sound
 
     def save_options_to_file(self):
@@ -686,8 +1117,78 @@ class MainWindow(QMainWindow):
         self.options_manager.set_option("random_order", self.opt_random.checkbox.isChecked())
         self.options_manager.set_option("auto_listen", self.opt_auto_listen.checkbox.isChecked())
         self.options_manager.set_option("success_sound", self.opt_success_sound.checkbox.isChecked())
+        self.options_manager.set_option(
+            "audio_backend", "sink" if self.opt_low_latency.checkbox.isChecked() else "soundeffect")
+        self.options_manager.set_option("difficulty_order", self.opt_difficulty.checkbox.isChecked())
         self.options_manager.save_options()
 
+    def show_category_overview(self):
+        """Show the pictures of all the pairs of the current category, and go to the clicked
+        pair."""
+        if self.engine.category is None:
+            self.choose_default_category()
+            if self.engine.category is None:
+                return
+        dialog = CategoryOverviewDialog(self.engine.category, self.engine.category_pairs,
+                                        PathManager.cache_dir / "atlas", parent=self)
+        dialog.exec()
+        if dialog.selected_row is not None:
+            self.list_b.setCurrentRow(dialog.selected_row)
+            self.on_list_b_clicked(self.list_b.item(dialog.selected_row))
+
+    def export_worksheet(self):
+        """Export the pairs of the current category as a printable PDF worksheet. The pages are
+        rendered in the background, a progress dialog showing the pages done."""
+        if self.worksheet_export is not None:
+            return
+        if self.engine.category is None:
+            self.choose_default_category()
+            if self.engine.category is None:
+                return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Fiches",
+                                                   f"fiches_{self.engine.category}.pdf",
+                                                   "PDF (*.pdf)")
+        if not file_name:
+            return
+        self.worksheet_progress = QProgressDialog("Création des fiches...", None, 0, 0, self)
+        self.worksheet_progress.setWindowTitle("Fiches")
+        self.worksheet_progress.setWindowModality(Qt.WindowModal)
+        self.worksheet_progress.setMinimumDuration(0)
+        self.worksheet_progress.show()
+        self.worksheet_export = WorksheetExport({self.engine.category: self.engine.category_pairs},
+                                                Path(file_name),
+                                                PathManager.cache_dir / "worksheet", parent=self)
+        self.worksheet_export.progress.connect(self.on_worksheet_progress)
+        self.worksheet_export.finished.connect(self.on_worksheet_exported)
+        self.worksheet_export.start()
+
+    def on_worksheet_progress(self, done: int, total: int):
+        """A page of the worksheet was written."""
+        self.worksheet_progress.setMaximum(total)
+        self.worksheet_progress.setValue(done)
+
+    def on_worksheet_exported(self):
+        """The export thread ended: open the worksheet, or tell why it could not be written."""
+        export = self.worksheet_export
+        self.worksheet_export = None
+        self.worksheet_progress.close()
+        self.worksheet_progress = None
+        export.deleteLater()
+        if export.error is not None:
+            QMessageBox.warning(self, "Fiches",
+                                f"Les fiches n'ont pas pu être créées :\n{export.error}")
+        else:
+            self.open_pdf(str(export.output))
+
+    def ask_child_name(self):
+        """Ask the name of the child. The following answers start a new session for this child."""
+        child, ok = QInputDialog.getText(self, "Enfant", "Prénom de l'enfant :",
+                                         text=self.recorder.child)
+        if ok:
+            self.recorder.set_child(child.strip())
+            self.options_manager.set_option("child", self.recorder.child)
+            self.options_manager.save_options()
+
     def open_pdf(self, file_name):
         if platform.system() == "Windows":
             os.startfile(file_name)
@@ -730,7 +1231,30 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    mainWin = MainWindow()
-    mainWin.show()
-    sys.exit(app.exec())
+    # The worksheet export starts worker processes, also from the frozen executable.
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description=SoftwareInfo.NAME)
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="number of practice windows to open side by side")
+    parser.add_argument("--record", default=None,
+                        help="record the inputs of the first session to this trace file")
+    parser.add_argument("--poll", action="store_true",
+                        help="poll pairs.py and data/ for changes instead of watching them")
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    shared = SharedResources()
+    shared.convert_audio_for_device()
+    shared.watch_corpus(force_polling=args.poll)
+    for _ in range(max(1, args.sessions)):
+        shared.new_window()
+    if args.sessions > 1:
+        shared.tile_windows()
+    if args.record:
+        recorder = TraceRecorder(args.record, shared.windows[0])
+        app.aboutToQuit.connect(recorder.close)
+    exit_code = app.exec()
+    if shared.converter is not None:
+        shared.converter.close()
+    shared.write_latency_report()
+    sys.exit(exit_code)
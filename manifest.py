@@ -0,0 +1,197 @@
+"""
+Asset manifest.
+
+Computes which files of the data package are reachable from the corpus (pairs.pairs and the fin_*
+lists) and the fixed prompts, and builds a slim copy of the data package with only those files,
+optionally recompressed. Used by setup.py --slim.
+
+    python manifest.py            # Size report only.
+"""
+
+# pylint: disable = no-name-in-module
+
+import argparse
+import importlib.resources
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+
+import pairs as corpus_module
+from engine import ExerciseEngine
+
+
+# The data package, found like PathManager does, not next to this file, which is in the library
+# archive once frozen. Joining an existing child gives a concrete path.
+DATA_DIR = (importlib.resources.files("data") / "images").parent
+
+# Files used by the application itself, whatever the corpus.
+FIXED_FILES = {
+    "app_icon.png": "application icon",
+    "app_icon.ico": "application icon",
+    "manuel.pdf": "manual",
+    "images/_null.png": "empty image",
+    f"sounds/{ExerciseEngine.THIS_IS_SOUND}.wav": "prompt",
+    f"sounds/{ExerciseEngine.SHOW_ME_SOUND}.wav": "prompt",
+}
+FIXED_DIRS = {
+    "sounds/success": "success sound",
+}
+
+
+def corpus_pairs(module=corpus_module) -> list:
+    """All (list name, category, word1, word2) of the corpus module: the categories of `pairs`
+    and the plain lists of pairs (fin_s, fins, ...)."""
+    result = []
+    for name, value in vars(module).items():
+        if name.startswith("_") or not isinstance(value, list) or not value:
+            continue
+        for entry in value:
+            # A category: ["p_b", ["pain", "bain"], ...].
+            if isinstance(entry, list) and entry and isinstance(entry[0], str) \
+                    and len(entry) > 1 and isinstance(entry[1], list):
+                for word1, word2 in entry[1:]:
+                    result.append((name, entry[0], word1, word2))
+            # A plain pair: ["mou", "mousse"].
+            elif isinstance(entry, list) and len(entry) == 2 \
+                    and all(isinstance(word, str) for word in entry):
+                result.append((name, name, entry[0], entry[1]))
+    return result
+
+
+def referenced_assets(data_dir: Path = DATA_DIR, module=corpus_module) -> tuple:
+    """Files of data_dir needed at runtime.
+    Returns (referenced, missing): referenced maps a relative path to the reasons it is kept,
+    missing maps the relative paths referenced by the corpus but absent to their reasons."""
+    wanted = {}
+    for path, reason in FIXED_FILES.items():
+        wanted.setdefault(path, []).append(reason)
+    for directory, reason in FIXED_DIRS.items():
+        for file in sorted((data_dir / directory).glob("*")):
+            if file.is_file():
+                wanted.setdefault(file.relative_to(data_dir).as_posix(), []).append(reason)
+    for list_name, category, word1, word2 in corpus_pairs(module):
+        reason = f"{list_name}: {category} ({word1} / {word2})"
+        for word in (word1, word2):
+            wanted.setdefault(f"images/{word}.png", []).append(reason)
+            wanted.setdefault(f"sounds/{word}.wav", []).append(reason)
+
+    # Windows, where the application is deployed, finds "K.png" as "k.png".
+    existing = {path.lower(): path for path in all_files(data_dir)}
+    referenced = {}
+    missing = {}
+    for path, reasons in wanted.items():
+        if path.lower() in existing:
+            referenced.setdefault(existing[path.lower()], []).extend(reasons)
+        else:
+            missing[path] = reasons
+    return referenced, missing
+
+
+def all_files(data_dir: Path = DATA_DIR) -> list:
+    """Relative paths of every file of the data package."""
+    return sorted(file.relative_to(data_dir).as_posix()
+                  for file in data_dir.rglob("*") if file.is_file()
+                  and "__pycache__" not in file.parts)
+
+
+def compress_image(source: Path, destination: Path, max_size: int = None) -> bool:
+    """Re-encode a PNG with the highest compression, downscaled to max_size pixels if given.
+    Keeps the result only if it is smaller than the source. Returns True if kept."""
+    image = QImage(str(source))
+    if image.isNull():
+        return False
+    if max_size and max(image.width(), image.height()) > max_size:
+        indexed = image.format() == QImage.Format_Indexed8
+        image = image.scaled(max_size, max_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        # Smooth scaling goes through 32 bits: the pictograms have few colors, a palette is
+        # enough and keeps the file small.
+        if indexed:
+            image = image.convertToFormat(QImage.Format_Indexed8)
+    # For PNG, quality 0 is the highest compression level.
+    if not image.save(str(destination), "PNG", 0):
+        return False
+    if destination.stat().st_size >= source.stat().st_size:
+        shutil.copy2(source, destination)
+        return False
+    return True
+
+
+def build_slim_data(destination: Path = None, data_dir: Path = DATA_DIR, compress: bool = False,
+                    max_image_size: int = None) -> dict:
+    """Copy the referenced files of data_dir into destination (which is emptied first).
+    Returns a report: included/excluded/missing files and sizes.
+    Without destination, only the report is computed."""
+    referenced, missing = referenced_assets(data_dir)
+    excluded = {path: (data_dir / path).stat().st_size
+                for path in all_files(data_dir) if path not in referenced}
+    report = {"included": len(referenced),
+              "original_size": sum((data_dir / path).stat().st_size for path in referenced),
+              "compressed": 0, "excluded": excluded, "missing": missing}
+    report["included_size"] = report["original_size"]
+    if destination is None:
+        return report
+
+    if destination.exists():
+        shutil.rmtree(destination)
+    to_compress = []
+    for path in sorted(referenced):
+        source = data_dir / path
+        target = destination / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if compress and source.suffix.lower() == ".png" and path != "app_icon.png":
+            to_compress.append((source, target))
+        else:
+            shutil.copy2(source, target)
+
+    # Images are independent: recompress them on all cores.
+    if to_compress:
+        with ProcessPoolExecutor() as executor:
+            kept = executor.map(compress_image,
+                                [source for source, _ in to_compress],
+                                [target for _, target in to_compress],
+                                [max_image_size] * len(to_compress),
+                                chunksize=8)
+            report["compressed"] = sum(kept)
+    report["included_size"] = sum((destination / path).stat().st_size for path in referenced)
+    return report
+
+
+def format_report(report: dict) -> str:
+    """Size report, with the excluded files and the reason they were excluded."""
+    mb = 1024 * 1024
+    lines = [f"Included: {report['included']} files, {report['included_size'] / mb:.1f} MB "
+             f"(originals {report['original_size'] / mb:.1f} MB, "
+             f"{report['compressed']} images recompressed)"]
+    excluded_size = sum(report["excluded"].values())
+    lines.append(f"Excluded: {len(report['excluded'])} files, {excluded_size / mb:.1f} MB")
+    for path, size in sorted(report["excluded"].items()):
+        lines.append(f"  - {path} ({size / 1024:.0f} KB): "
+                     "not referenced by the corpus nor by the application")
+    if report["missing"]:
+        lines.append(f"Missing: {len(report['missing'])} files referenced but absent")
+        for path, reasons in sorted(report["missing"].items()):
+            lines.append(f"  ! {path}: {reasons[0]}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Print the size report, and build the slim data package if a destination is given."""
+    parser = argparse.ArgumentParser(description="Reachability report of the data package.")
+    parser.add_argument("--build", type=Path, default=None,
+                        help="copy the referenced files into this directory")
+    parser.add_argument("--compress", action="store_true", help="recompress the images")
+    parser.add_argument("--max-image-size", type=int, default=None,
+                        help="with --compress, downscale images to this many pixels")
+    args = parser.parse_args(argv)
+
+    report = build_slim_data(args.build, compress=args.compress,
+                             max_image_size=args.max_image_size)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
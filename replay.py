@@ -0,0 +1,201 @@
+"""
+Replay of recorded sessions.
+
+Drives a MainWindow offscreen, with the null audio backend, through a trace recorded with
+main.py --record, and reports the latency of each input. Traces kept as fixtures make an
+end-to-end performance regression test:
+
+    python replay.py session.jsonl --max-p95 50
+
+By default the inputs are replayed one after the other as fast as possible and sounds end at once:
+only the inputs the input gate let through in the session are replayed, coalesced list clicks at
+the time they were released, so that the replay follows the recorded session. With --realtime,
+all the clicks are posted at their recorded times and sounds last as long as the clips, so that
+clicks made while a sound plays meet the closed gate again.
+"""
+
+# pylint: disable = no-name-in-module, wrong-import-position
+
+import os
+
+# Must be set before Qt is loaded.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+
+from audio import NullBackend
+from main import MainWindow, SharedResources
+from session_trace import load_trace
+
+
+def percentile(values: list, percent: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Replayer:
+    """Replays the events of a trace on a new MainWindow."""
+
+    def __init__(self, header: dict, realtime: bool = False):
+        """Init. The window works in a temporary directory, so that the options and the answers
+        of the replay do not mix with real ones."""
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        self.realtime = realtime
+        self.workdir = tempfile.TemporaryDirectory()  # pylint: disable = consider-using-with
+        self.previous_dir = os.getcwd()
+        os.chdir(self.workdir.name)
+
+        options = {key: value for key, value in header["options"].items()
+                   if key != "low_latency"}
+        options["audio_backend"] = "null"
+        with open("options.json", "w", encoding="utf-8") as file:
+            json.dump(options, file)
+
+        self.shared = SharedResources()
+        self.window = MainWindow(shared=self.shared, seed=header["seed"])
+        if realtime:
+            self.shared.audio = NullBackend(realtime=True, cache=self.shared.cache)
+        self.window.resize(header["width"], header["height"])
+        self.window.show()
+        self.app.processEvents()
+
+        # Event name -> handling times, and delays between the recorded time and the dispatch.
+        self.latencies = {}
+        self.lags = {}
+        self.done = 0
+        self.start = None
+
+    def dispatch(self, event: dict):
+        """Send one recorded input to the window, the way the widget would."""
+        window = self.window
+        name = event["event"]
+        if name in ("list_a", "list_b"):
+            widget = window.list_a if name == "list_a" else window.list_b
+            item = widget.item(event["row"])
+            if item is not None:
+                widget.setCurrentItem(item)
+                widget.itemClicked.emit(item)
+        elif name == "category":
+            # Chosen by a menu action before any category was clicked.
+            item = window.list_a.item(event["row"])
+            if item is not None:
+                window.list_a.setCurrentItem(item)
+                window.show_category(item)
+        elif name == "image":
+            if event["image"] == 1:
+                window.image_label1_clicked(None)
+            else:
+                window.image_label2_clicked(None)
+        elif name == "listen":
+            window.listen_button.click()
+        elif name == "next":
+            window.next_button.click()
+        elif name == "resize":
+            window.resize(event["width"], event["height"])
+        elif name == "option" and event["key"] in window.option_checkboxes:
+            # The audio backend stays the null one.
+            if event["key"] != "low_latency":
+                window.option_checkboxes[event["key"]].checkbox.setChecked(event["value"])
+
+    def run_event(self, event: dict):
+        """Dispatch an event and measure it."""
+        begin = time.perf_counter()
+        if self.start is not None:
+            self.lags.setdefault(event["event"], []).append(begin - self.start - event["t"])
+        self.dispatch(event)
+        self.app.processEvents()
+        self.latencies.setdefault(event["event"], []).append(time.perf_counter() - begin)
+        self.done += 1
+
+    def run(self, events: list):
+        """Replay all the events."""
+        if not self.realtime:
+            # The gate stays open here: dropped inputs would run, and coalesced ones twice.
+            for event in events:
+                if event.get("gate", "accepted") in ("accepted", "released"):
+                    self.run_event(event)
+            return
+
+        # Inputs are posted to the event loop at their recorded times: those arriving while a
+        # sound plays meet the closed input gate, as in the real session.
+        events = [event for event in events if event.get("gate") != "released"]
+        self.start = time.perf_counter()
+        for event in events:
+            QTimer.singleShot(int(event["t"] * 1000), lambda event=event: self.run_event(event))
+        while self.done < len(events):
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def report(self) -> dict:
+        """Per event name: count, p50, p95 and max handling time in milliseconds, and the lag
+        behind the recorded time in realtime mode."""
+        report = {}
+        for name, values in sorted(self.latencies.items()):
+            report[name] = {"count": len(values),
+                            "p50": percentile(values, 50) * 1000,
+                            "p95": percentile(values, 95) * 1000,
+                            "max": max(values) * 1000}
+            if name in self.lags:
+                report[name]["lag_p95"] = percentile(self.lags[name], 95) * 1000
+        report["_dropped_inputs"] = self.window.input_gate.dropped_total
+        return report
+
+    def close(self):
+        """Close the window and leave the temporary directory."""
+        self.window.close()
+        os.chdir(self.previous_dir)
+        self.workdir.cleanup()
+
+
+def main(argv=None) -> int:
+    """Replay a trace and print the latencies. Returns 1 if a p95 exceeds --max-p95."""
+    parser = argparse.ArgumentParser(description="Replay a recorded session offscreen.")
+    parser.add_argument("trace", help="trace file recorded with main.py --record")
+    parser.add_argument("--realtime", action="store_true",
+                        help="respect the recorded timing and the duration of the sounds")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="fail if the p95 latency of an event type exceeds this (ms)")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    trace_path = os.path.abspath(args.trace)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    header, events = load_trace(trace_path)
+    replayer = Replayer(header, realtime=args.realtime)
+    try:
+        replayer.run(events)
+        report = replayer.report()
+    finally:
+        replayer.close()
+
+    failed = []
+    print(f"{'event':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, stats in report.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:<10} {stats['count']:>6} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+              f"{stats['max']:>8.1f}"
+              + (f"   lag p95 {stats['lag_p95']:.1f} ms" if "lag_p95" in stats else ""))
+        if args.max_p95 is not None and stats["p95"] > args.max_p95:
+            failed.append(name)
+    print(f"Inputs dropped during feedback: {report['_dropped_inputs']}")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if failed:
+        print(f"p95 above {args.max_p95} ms for: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Response recording.
+
+Every click on an image is appended to a CSV file, one row per attempt, for the analytics.
+"""
+
+import csv
+import time
+import uuid
+from pathlib import Path
+
+from engine import AnswerResult
+
+
+FIELDS = ["timestamp", "child", "session", "category", "correct_word", "selected_word",
+          "correct_side", "selected_side", "correct", "response_time"]
+
+
+class ResponseRecorder:
+    """Append the answers of a session to a CSV file shared by all the sessions."""
+
+    def __init__(self, file_path, child: str = "", clock=time.time, window: int = 1):
+        """Init. window is the session number of the main window, so that windows started in the
+        same second do not share their session."""
+        self.file_path = Path(file_path)
+        self.clock = clock
+        self.child = child
+        self.window = window
+        self.session = None
+        self.new_session()
+
+    def new_session(self):
+        """Start a new session, e.g. when another child sits down.
+        The key starts with the time so that sorting the keys sorts the sessions; the window number
+        and a random suffix tell apart the sessions started in the same second."""
+        start = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.clock()))
+        self.session = f"{start} #{self.window} {uuid.uuid4().hex[:6]}"
+
+    def set_child(self, child: str):
+        """Change the child the next answers belong to. Starts a new session."""
+        self.child = child
+        self.new_session()
+
+    def record(self, result: AnswerResult):
+        """Append one answer."""
+        write_header = not self.file_path.is_file()
+        with open(self.file_path, "a", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(FIELDS)
+            writer.writerow([f"{self.clock():.3f}", self.child, self.session, result.category,
+                             result.correct_word, result.selected_word,
+                             result.correct_side, result.selected_side,
+                             int(result.correct), f"{result.response_time:.3f}"])
@@ -0,0 +1,58 @@
+"""
+Session traces.
+
+A trace is a JSON lines file: a header with what is needed to start the session again (RNG seed,
+options, window size), then one line per user input with its time since the start of the
+recording. Inputs that go through the input gate carry its outcome ("gate": accepted, dropped or
+coalesced); a coalesced input that finally runs is written again, as "released", at that time.
+Written by TraceRecorder (main.py --record), read back by replay.py.
+"""
+
+import json
+import time
+
+
+TRACE_VERSION = 1
+
+
+class TraceRecorder:
+    """Record the user inputs of a MainWindow to a trace file."""
+
+    def __init__(self, file_path, window, clock=time.perf_counter):
+        """Init. Starts recording at once."""
+        self.clock = clock
+        self.start = self.clock()
+        self.file = open(file_path, "w", encoding="utf-8")  # pylint: disable = consider-using-with
+        header = {"version": TRACE_VERSION,
+                  "seed": window.seed,
+                  "width": window.width(),
+                  "height": window.height(),
+                  "options": {key: item.checkbox.isChecked()
+                              for key, item in window.option_checkboxes.items()}}
+        self.write(header)
+        self.window = window
+        window.event_log = self
+
+    def write(self, record: dict):
+        """Write one line, flushed so that a crash keeps the trace up to it."""
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def log(self, name: str, **fields):
+        """Record one user input."""
+        self.write({"t": round(self.clock() - self.start, 4), "event": name, **fields})
+
+    def close(self):
+        """Stop recording."""
+        if self.window.event_log is self:
+            self.window.event_log = None
+        self.file.close()
+
+
+def load_trace(file_path) -> tuple:
+    """Read a trace. Returns (header, events)."""
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file if line.strip()]
+    if not lines or lines[0].get("version") != TRACE_VERSION:
+        raise ValueError(f"{file_path} is not a version {TRACE_VERSION} session trace.")
+    return lines[0], lines[1:]
@@ -1,9 +1,13 @@
 """
 python src\setup.py build
+
+Slim build, with only the images and sounds referenced by the corpus and the application:
+python src\setup.py build --slim [--compress] [--max-image-size 1200]
 """
 
 import sys
 import importlib.resources
+from pathlib import Path
 from cx_Freeze import setup, Executable
 
 from main import SoftwareInfo
@@ -14,6 +18,22 @@ if sys.platform == "win32":
     base = "Win32GUI"
 
 
+def pop_flag(name: str, has_value: bool = False):
+    """Remove a custom option from the command line, which cx_Freeze does not know.
+    Returns its value, True for a flag, or None if absent."""
+    if name not in sys.argv:
+        return None
+    index = sys.argv.index(name)
+    value = sys.argv[index + 1] if has_value else True
+    del sys.argv[index:index + (2 if has_value else 1)]
+    return value
+
+
+slim = pop_flag("--slim")
+compress = pop_flag("--compress")
+max_image_size = pop_flag("--max-image-size", has_value=True)
+
+
 # Remplacez "mon_script" par le nom de votre fichier de script sans l'extension .py
 executables = [Executable("src/main.py",
                           base=base,
@@ -36,6 +56,18 @@ options = {
 }
 
 
+if slim:
+    from manifest import build_slim_data, format_report
+
+    # The data package is replaced by a copy holding only the reachable files.
+    slim_data = Path("build") / "slim" / "data"
+    report = build_slim_data(slim_data, compress=bool(compress),
+                             max_image_size=int(max_image_size) if max_image_size else None)
+    print(format_report(report))
+    options["build_exe"]["includes"].remove("data")
+    options["build_exe"]["include_files"] = [(str(slim_data), "lib/data")]
+
+
 setup(
     name=SoftwareInfo.NAME,
     version=SoftwareInfo.VERSION,
@@ -0,0 +1,183 @@
+"""
+Simulation harness.
+
+Runs virtual children through the exercise engine, headless and in parallel across processes, to
+benchmark schedulers and corpora.
+
+    python simulate.py --children 5000 --items 200 --profile voicing --workers 8
+"""
+
+import argparse
+import importlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import ExerciseEngine, EngineState
+
+
+class ErrorProfile:
+    """How often a virtual child picks the wrong image, and how fast it answers.
+    contrast_error_rates overrides error_rate for some categories ("p_b": 0.4)."""
+
+    def __init__(self, error_rate: float, contrast_error_rates: dict = None,
+                 mean_response_time: float = 2.0):
+        """Init."""
+        self.error_rate = error_rate
+        self.contrast_error_rates = contrast_error_rates or {}
+        self.mean_response_time = mean_response_time
+
+    def error_rate_for(self, category: str) -> float:
+        """Error rate of the child on the given category."""
+        return self.contrast_error_rates.get(category, self.error_rate)
+
+
+PROFILES = {
+    "typical": ErrorProfile(0.1),
+    "voicing": ErrorProfile(0.1, {"p_b": 0.4, "t_d": 0.4, "k_g": 0.4, "f_v": 0.4, "s_z": 0.4,
+                                  "ch_j": 0.4}),
+    "fronting": ErrorProfile(0.1, {"t_k": 0.45, "tr_kr": 0.45, "s_ch": 0.35, "j_z": 0.35}),
+    "nasals": ErrorProfile(0.1, {"a_an": 0.4, "an_on": 0.45}),
+    "guessing": ErrorProfile(0.5, mean_response_time=1.0),
+}
+
+
+class VirtualClock:
+    """Clock advanced by the simulation instead of real time."""
+
+    def __init__(self):
+        """Init."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def load_corpus(spec: str) -> list:
+    """Load a corpus from a "module:attribute" spec, e.g. "pairs:pairs" or "pairs:fins"."""
+    module_name, _, attribute = spec.partition(":")
+    corpus = getattr(importlib.import_module(module_name), attribute or "pairs")
+    # The fin_* lists are plain lists of pairs: wrap them in a single category.
+    if corpus and isinstance(corpus[0][0], str) and isinstance(corpus[0][1], str):
+        corpus = [[attribute] + corpus]
+    return corpus
+
+
+def simulate_child(corpus: list, profile: ErrorProfile, items: int, random_order: bool,
+                   seed: int) -> dict:
+    """Run one virtual child through items pairs, picking a random category to start with.
+    Returns counters for this child."""
+    rng = random.Random(seed)
+    clock = VirtualClock()
+    engine = ExerciseEngine(corpus, rng=random.Random(rng.random()), clock=clock)
+    engine.select_category(rng.choice(engine.categories()))
+    engine.select_row(0)
+
+    error_rate = profile.error_rate_for(engine.category)
+    correct = 0
+    attempts = 0
+    for _ in range(items):
+        item = engine.current_item
+        # Keep clicking until the right image is found, like a child does.
+        while engine.state == EngineState.AWAITING_ANSWER:
+            clock.now += rng.expovariate(1 / profile.mean_response_time)
+            if rng.random() < error_rate:
+                selected = item.word2 if item.audio == item.word1 else item.word1
+            else:
+                selected = item.audio
+            result = engine.answer(selected)
+            attempts += 1
+            correct += result.correct
+        engine.select_row(engine.next_row(random_order=random_order))
+
+    return {"items": items, "attempts": attempts, "correct": correct,
+            "session_time": clock.now}
+
+
+def peak_rss() -> int:
+    """Peak resident memory of the process in bytes, or None if unknown on this system."""
+    try:
+        import resource  # pylint: disable = import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_batch(corpus_spec: str, profile_name: str, children: int, items: int,
+              random_order: bool, seed: int) -> dict:
+    """Run a batch of children in one worker process. Returns aggregated counters, the worker's
+    wall time and its peak resident memory (None if unknown)."""
+    corpus = load_corpus(corpus_spec)
+    profile = PROFILES[profile_name]
+    rng = random.Random(seed)
+
+    totals = {"children": children, "items": 0, "attempts": 0, "correct": 0,
+              "session_time": 0.0}
+    start = time.perf_counter()
+    for _ in range(children):
+        stats = simulate_child(corpus, profile, items, random_order, rng.getrandbits(64))
+        for key, value in stats.items():
+            totals[key] += value
+    totals["wall_time"] = time.perf_counter() - start
+    # Counted by the system: tracing the allocations would slow down the timed loop.
+    totals["peak_memory"] = peak_rss()
+    return totals
+
+
+def run_simulation(corpus_spec: str = "pairs:pairs", profile_name: str = "typical",
+                   children: int = 1000, items: int = 100, random_order: bool = True,
+                   workers: int = None, seed: int = 0) -> dict:
+    """Split the children across worker processes and aggregate the results."""
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, children))
+    # Spread children evenly, the first batches take the remainder.
+    sizes = [children // workers + (i < children % workers) for i in range(workers)]
+    seeds = random.Random(seed).sample(range(2 ** 32), workers)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        batches = list(executor.map(run_batch,
+                                    [corpus_spec] * workers, [profile_name] * workers, sizes,
+                                    [items] * workers, [random_order] * workers, seeds))
+    wall_time = time.perf_counter() - start
+
+    report = {"workers": workers, "wall_time": wall_time}
+    for key in ("children", "items", "attempts", "correct"):
+        report[key] = sum(batch[key] for batch in batches)
+    report["items_per_sec"] = report["items"] / wall_time if wall_time else 0.0
+    report["accuracy"] = report["correct"] / report["attempts"] if report["attempts"] else 0.0
+    peaks = [batch["peak_memory"] for batch in batches if batch["peak_memory"] is not None]
+    report["peak_memory"] = max(peaks) if peaks else None
+    return report
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Simulate virtual children headlessly.")
+    parser.add_argument("--corpus", default="pairs:pairs",
+                        help='corpus as "module:attribute" (default: pairs:pairs)')
+    parser.add_argument("--profile", default="typical", choices=sorted(PROFILES))
+    parser.add_argument("--children", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=100, help="pairs per child")
+    parser.add_argument("--order", default="random", choices=["random", "sequential"])
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run_simulation(args.corpus, args.profile, args.children, args.items,
+                            args.order == "random", args.workers, args.seed)
+    print(f"{report['children']} children, {report['items']} items, "
+          f"{report['attempts']} attempts on {report['workers']} workers")
+    print(f"Accuracy: {report['accuracy']:.1%}")
+    print(f"Wall time: {report['wall_time']:.2f} s "
+          f"({report['items_per_sec']:.0f} items/s)")
+    if report["peak_memory"] is not None:
+        print(f"Peak memory per worker: {report['peak_memory'] / 2 ** 20:.1f} MiB (RSS)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Soak test.
+
+Runs the item loop (next_item -> handle_list_b_click -> check_answer) of an offscreen MainWindow
+tens of thousands of times, and samples the resources of the process at intervals: RSS, memory
+traced by tracemalloc, Python objects by type and open file handles. Fails if they grow more than
+the thresholds after the warm-up.
+
+    python soak.py --iterations 50000 --csv soak.csv
+    python soak.py --backend soundeffect --iterations 2000 --interval 100 --warmup 100
+
+The null audio backend (the default) ends the sounds at once. The soundeffect and sink backends
+play them on the audio device, to find leaks in the audio path: each item then lasts as long as
+its sounds, a few seconds.
+
+The CSV is a time series to be charted; the object counts of the most common types go to a second
+file, <csv>.types.csv, in long format (iteration, type, count).
+"""
+
+# pylint: disable = no-name-in-module, wrong-import-position
+
+import os
+
+# Must be set before Qt is loaded.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import contextlib
+import csv
+import gc
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from PySide6.QtWidgets import QApplication
+
+from main import MainWindow, SharedResources
+
+
+def rss_kb() -> int:
+    """Resident memory of the process in KB, or None if unknown on this system."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil  # pylint: disable = import-outside-toplevel
+        return psutil.Process().memory_info().rss // 1024
+    except ImportError:
+        return None
+
+
+def open_files() -> int:
+    """Number of open file descriptors/handles, or None if unknown on this system."""
+    if os.path.isdir("/proc/self/fd"):
+        return len(os.listdir("/proc/self/fd"))
+    try:
+        import psutil  # pylint: disable = import-outside-toplevel
+        process = psutil.Process()
+        return process.num_handles() if os.name == "nt" else process.num_fds()
+    except ImportError:
+        return None
+
+
+def object_counts() -> Counter:
+    """Number of objects tracked by the garbage collector, by type name."""
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+class Soak:
+    """Drives one MainWindow through the item loop and samples its resources."""
+
+    def __init__(self, seed: int = 0, error_rate: float = 0.3, top_types: int = 20,
+                 backend: str = "null"):
+        """Init. The window works in a temporary directory, like replay.py."""
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        self.rng = random.Random(seed)
+        self.error_rate = error_rate
+        self.top_types = top_types
+        self.workdir = tempfile.TemporaryDirectory()  # pylint: disable = consider-using-with
+        self.previous_dir = os.getcwd()
+        os.chdir(self.workdir.name)
+        with open("options.json", "w", encoding="utf-8") as file:
+            json.dump({"random_order": True, "auto_listen": True, "success_sound": True,
+                       "hide_next_button": True, "audio_backend": backend}, file)
+
+        self.shared = SharedResources()
+        self.window = MainWindow(shared=self.shared, seed=seed)
+        self.window.show()
+        self.samples = []
+        self.type_samples = []
+        self.snapshots = []
+
+    def step(self, iteration: int):
+        """One item: sometimes a wrong answer, then the right one, which goes to the next item.
+        The category changes and the window is resized from time to time."""
+        window = self.window
+        if iteration % 500 == 0:
+            row = self.rng.randrange(window.list_a.count())
+            window.list_a.setCurrentRow(row)
+            window.on_list_a_clicked(window.list_a.item(row))
+        if iteration % 97 == 0:
+            window.resize(self.rng.randint(600, 1400), self.rng.randint(500, 900))
+
+        item = window.current_item
+        if self.rng.random() < self.error_rate:
+            wrong = item.word2 if item.audio == item.word1 else item.word1
+            window.check_answer(wrong)
+        window.check_answer(item.audio)
+        self.app.processEvents()
+        # With a real backend, the sounds are played one after the other by the event loop.
+        while not window.input_gate.is_open:
+            time.sleep(0.005)
+            self.app.processEvents()
+
+    def sample(self, iteration: int, elapsed: float):
+        """Record the resources of the process."""
+        gc.collect()
+        counts = object_counts()
+        traced, _ = tracemalloc.get_traced_memory()
+        self.samples.append({"iteration": iteration, "seconds": round(elapsed, 2),
+                             "rss_kb": rss_kb(), "traced_kb": traced // 1024,
+                             "objects": sum(counts.values()), "open_files": open_files(),
+                             "cached_assets": len(self.shared.cache)})
+        self.type_samples.append((iteration, counts))
+        self.snapshots.append(tracemalloc.take_snapshot())
+        # Only the first snapshot after warm-up and the last one are compared.
+        if len(self.snapshots) > 2:
+            del self.snapshots[1]
+
+    def run(self, iterations: int, interval: int, warmup: int):
+        """Run the loop. A sample is taken after warm-up and then every interval iterations.
+        The growth is measured from the warm-up sample: warmup + interval must not exceed
+        iterations, so that at least one sample follows it."""
+        if warmup + interval > iterations:
+            raise ValueError(f"{iterations} iterations leave no sample after a warm-up of {warmup} "
+                             f"and an interval of {interval}.")
+        window = self.window
+        window.on_list_a_clicked(window.list_a.item(0))
+        tracemalloc.start()
+        start = time.perf_counter()
+        # Thousands of "Play ..." lines would fill the terminal.
+        with open(os.devnull, "w", encoding="utf-8") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            if warmup == 0:
+                self.sample(0, 0.0)
+            for iteration in range(1, iterations + 1):
+                self.step(iteration)
+                if iteration == warmup or (iteration > warmup and iteration % interval == 0):
+                    self.sample(iteration, time.perf_counter() - start)
+        if self.samples[-1]["iteration"] != iterations:
+            self.sample(iterations, time.perf_counter() - start)
+        tracemalloc.stop()
+
+    def growth(self) -> dict:
+        """Growth of each measure between the first and the last sample."""
+        first, last = self.samples[0], self.samples[-1]
+        return {key: last[key] - first[key] for key in ("rss_kb", "traced_kb", "objects",
+                                                        "open_files", "cached_assets")
+                if first[key] is not None and last[key] is not None}
+
+    def growing_types(self, count: int = 10) -> list:
+        """Types whose number of objects grew the most."""
+        first, last = self.type_samples[0][1], self.type_samples[-1][1]
+        growth = Counter({name: last[name] - first.get(name, 0) for name in last})
+        return [(name, delta) for name, delta in growth.most_common(count) if delta > 0]
+
+    def growing_lines(self, count: int = 10) -> list:
+        """Source lines whose allocations grew the most, from the tracemalloc snapshots."""
+        if len(self.snapshots) < 2:
+            return []
+        stats = self.snapshots[-1].compare_to(self.snapshots[0], "lineno")
+        return [str(stat) for stat in stats[:count] if stat.size_diff > 0]
+
+    def write_csv(self, file_path: str):
+        """Write the time series and the object counts of the most common types."""
+        with open(file_path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(self.samples[0]))
+            writer.writeheader()
+            writer.writerows(self.samples)
+
+        # The most common types at the end, followed through all the samples.
+        types = [name for name, _ in self.type_samples[-1][1].most_common(self.top_types)]
+        root, _ = os.path.splitext(file_path)
+        with open(root + ".types.csv", "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["iteration", "type", "count"])
+            for iteration, counts in self.type_samples:
+                writer.writerows([iteration, name, counts.get(name, 0)] for name in types)
+
+    def close(self):
+        """Close the window and leave the temporary directory."""
+        self.window.close()
+        os.chdir(self.previous_dir)
+        self.workdir.cleanup()
+
+
+def main(argv=None) -> int:
+    """Run the soak test. Returns 1 if a resource grew more than allowed."""
+    parser = argparse.ArgumentParser(description="Long-session soak test.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--backend", default="null", choices=["null", "soundeffect", "sink"],
+                        help="audio backend: null, or the sound card with soundeffect or sink")
+    parser.add_argument("--interval", type=int, default=1000, help="iterations between samples")
+    parser.add_argument("--warmup", type=int, default=1000,
+                        help="iterations before the first sample, the reference for the growth")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", default="soak.csv", help="time series output")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=50)
+    parser.add_argument("--max-object-growth", type=int, default=20000)
+    parser.add_argument("--max-file-growth", type=int, default=5)
+    args = parser.parse_args(argv)
+    if args.iterations < 1 or args.interval < 1 or args.warmup < 0:
+        parser.error("--iterations and --interval must be at least 1, --warmup at least 0")
+    if args.warmup + args.interval > args.iterations:
+        parser.error("--iterations must be at least --warmup + --interval, so that the growth is "
+                     "measured between two samples")
+    csv_path = os.path.abspath(args.csv)
+
+    soak = Soak(seed=args.seed, backend=args.backend)
+    try:
+        soak.run(args.iterations, args.interval, args.warmup)
+        soak.write_csv(csv_path)
+    finally:
+        soak.close()
+
+    growth = soak.growth()
+    last = soak.samples[-1]
+    print(f"{args.iterations} items with the {args.backend} backend in {last['seconds']:.0f} s, "
+          f"time series in {csv_path}")
+    for key, delta in growth.items():
+        print(f"  {key:<14} {delta:+}")
+
+    failures = []
+    if growth.get("rss_kb", 0) > args.max_rss_growth_mb * 1024:
+        failures.append(f"RSS grew by {growth['rss_kb'] / 1024:.1f} MB")
+    if growth.get("objects", 0) > args.max_object_growth:
+        failures.append(f"{growth['objects']} more Python objects")
+    if growth.get("open_files", 0) > args.max_file_growth:
+        failures.append(f"{growth['open_files']} more open files")
+    if failures:
+        print("FAILED: " + ", ".join(failures))
+        print("Growing types: " + ", ".join(f"{name} {delta:+}"
+                                           for name, delta in soak.growing_types()))
+        for line in soak.growing_lines():
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
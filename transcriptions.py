@@ -0,0 +1,69 @@
+"""
+Phonemic transcriptions of the words of the corpus (pairs.py), in the notation of Lexique, one
+character per phoneme (see lexicon.py). Words missing here are looked up in the local lexicon.
+"""
+
+transcriptions = {
+    # p_b
+    "pain": "p5", "bain": "b5", "palais": "palE", "balai": "balE", "pelle": "pEl",
+    "belle": "bEl", "peur": "p9R", "beurre": "b9R", "poire": "pwaR", "boire": "bwaR",
+    "pou": "pu", "boue": "bu", "pull": "pyl", "bulle": "byl", "poule": "pul", "boule": "bul",
+    "pompon": "p§p§", "bonbon": "b§b§", "percer": "pERse", "bercer": "bERse",
+    "peigner": "peNe", "baigner": "beNe", "pois": "pwa", "bois": "bwa",
+    # t_d
+    "touche": "tuS", "douche": "duS", "tord": "tOR", "dort": "dOR", "tôt": "to", "dos": "do",
+    "temps": "t@", "dent": "d@", "toux": "tu", "doux": "du", "thé": "te", "dé": "de",
+    "tire": "tiR", "dire": "diR", "tard": "taR", "dard": "daR", "râteau": "Rato",
+    "radeau": "Rado",
+    # k_g
+    "bac": "bak", "bague": "bag", "camp": "k@", "gant": "g@", "car": "kaR", "gare": "gaR",
+    "carré": "kaRe", "garé": "gaRe", "cou": "ku", "goût": "gu", "classe": "klas",
+    "glace": "glas", "oncle": "§kl", "ongle": "§gl", "crotte": "kROt", "grotte": "gROt",
+    "crier": "kRije", "griller": "gRije",
+    # f_v
+    "faim": "f5", "vingt": "v5", "fâche": "faS", "vache": "vaS", "fils": "fis", "vis": "vis",
+    "faux": "fo", "veau": "vo", "faon": "f@", "vent": "v@", "folle": "fOl", "vole": "vOl",
+    "fée": "fe", "v": "ve", "baffe": "baf", "bave": "bav", "foot": "fut", "voûte": "vut",
+    "fond": "f§", "vont": "v§", "fer": "fER", "verre": "vER", "fil": "fil", "ville": "vil",
+    # s_z
+    "coussin": "kus5", "cousin": "kuz5", "poisson": "pwas§", "poison": "pwaz§",
+    "douce": "dus", "douze": "duz", "tresse": "tREs", "treize": "tREz", "seau": "so",
+    "zoo": "zo", "casse": "kas", "case": "kaz", "dessert": "desER", "désert": "dezER",
+    "visser": "vise", "viser": "vize", "les soeurs": "les9R", "les heures": "lez9R",
+    # ch_j
+    "champ": "S@", "gens": "Z@", "chou": "Su", "joue": "Zu", "lécher": "leSe", "léger": "leZe",
+    "manche": "m@S", "mange": "m@Z", "bêche": "bES", "beige": "bEZ", "boucher": "buSe",
+    "bouger": "buZe", "je l'achète": "Z°laSEt", "je la jette": "Z°laZEt", "cache": "kaS",
+    "cage": "kaZ", "hache": "aS", "âge": "aZ", "chaîne": "SEn", "gêne": "ZEn",
+    # j_z
+    "jaune": "Zon", "zone": "zon", "rage": "RaZ", "rase": "Raz", "bouse": "buz",
+    "bouge": "buZ", "des oeufs": "dez2", "des jeux": "deZ2",
+    # s_ch
+    "sous": "su", "chaud": "So", "sang": "s@", "bus": "bys", "bûche": "byS", "cassé": "kase",
+    "caché": "kaSe", "mousse": "mus", "mouche": "muS", "tasse": "tas", "tache": "taS",
+    "perché": "pERSe", "brosse": "bROs", "broche": "bROS",
+    # t_k
+    "pâté": "pate", "paquet": "pakE", "pâtes": "pat", "pâques": "pak", "taché": "taSe",
+    "tarte": "taRt", "carte": "kaRt", "tube": "tyb", "cube": "kyb", "tas": "ta", "k": "ka",
+    "tour": "tuR", "court": "kuR", "tôle": "tol", "colle": "kOl", "tape": "tap", "cape": "kap",
+    # tr_kr
+    "trier": "tRije", "trois": "tRwa", "croix": "kRwa", "trop": "tRo", "croc": "kRo",
+    "trait": "tRE", "craie": "kRE", "entre": "@tR", "encre": "@kR",
+    # r_l
+    "barre": "baR", "balle": "bal", "roue": "Ru", "loup": "lu", "poêle": "pwal", "rat": "Ra",
+    "la": "la", "mare": "maR", "malle": "mal", "reine": "REn", "laine": "lEn", "fort": "fOR",
+    "père": "pER", "robe": "ROb", "lobe": "lOb", "rang": "R@", "lent": "l@", "riz": "Ri",
+    "lit": "li",
+    # a_an
+    "chat": "Sa", "chant": "S@", "bas": "ba", "banc": "b@", "K": "ka", "fa": "fa", "va": "va",
+    "plat": "pla", "plan": "pl@",
+    # an_on
+    "blanc": "bl@", "blond": "bl§", "bond": "b§", "rond": "R§", "tond": "t§", "paon": "p@",
+    "pont": "p§", "don": "d§", "long": "l§", "ranger": "R@Ze", "ronger": "R§Ze",
+    # fin_*
+    "pince": "p5s", "mou": "mu", "scie": "si", "six": "sis", "route": "Rut", "chante": "S@t",
+    "pas": "pa", "boîte": "bwat", "mât": "ma", "pue": "py", "lire": "liR",
+    "char": "SaR", "rame": "Ram", "pot": "po", "pomme": "pOm", "poulpe": "pulp",
+    "bouche": "buS", "canne": "kan", "coude": "kud", "range": "R@Z", "louche": "luS",
+    "ment": "m@",
+}
@@ -0,0 +1,303 @@
+"""
+Printable worksheets.
+
+Lays out the pairs of categories of pairs.pairs or of the fin_* lists on A4 pages, the two pictures
+of each pair side by side with their words below, for practice at home. Pages are rendered by a
+pool of processes from downscaled copies of the pictures, cached in cache/worksheet/, and written
+one by one as they come back, with a bounded number of pages in flight, so that exporting the whole
+corpus uses all the cores in a fixed amount of memory.
+
+    python worksheet.py p_b fin_s --output fiches.pdf
+    python worksheet.py --all --format png --output fiches/
+"""
+
+# pylint: disable = no-name-in-module
+
+import argparse
+import importlib.resources
+import multiprocessing
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PySide6.QtCore import Qt, QByteArray, QBuffer, QIODevice, QMarginsF, QRect, QThread, Signal
+from PySide6.QtGui import (QFont, QGuiApplication, QImage, QImageReader, QPainter, QPageSize,
+                           QPdfWriter, QColor)
+
+from manifest import corpus_pairs
+
+
+# A4 in millimeters.
+PAGE_SIZE_MM = (210, 297)
+ROWS_PER_PAGE = 4
+MARGIN_MM = 12
+
+
+def corpus_lists() -> dict:
+    """Pairs of each category of pairs.pairs and of each fin_* list, in the order of pairs.py:
+    {"p_b": [["pain", "bain"], ...], "fin_s": [...]}."""
+    lists = {}
+    for _, category, word1, word2 in corpus_pairs():
+        lists.setdefault(category, []).append([word1, word2])
+    return lists
+
+
+def list_labels() -> dict:
+    """Labels of the lists printed on the pages: the categories of pairs.pairs as in the
+    application ("p / b"). The plain lists (fin_s, ...) keep their name."""
+    return {category: category.replace("_", " / ")
+            for name, category, _, _ in corpus_pairs() if name != category}
+
+
+def paginate(lists: dict, rows_per_page: int = ROWS_PER_PAGE) -> list:
+    """Pages of the worksheets: dicts with the title, the label printed, the pairs and the page
+    number in the category."""
+    labels = list_labels()
+    pages = []
+    for title, word_pairs in lists.items():
+        count = (len(word_pairs) + rows_per_page - 1) // rows_per_page
+        for number in range(count):
+            pages.append({"title": title, "label": labels.get(title, title),
+                          "pairs": word_pairs[number * rows_per_page:(number + 1) * rows_per_page],
+                          "number": number + 1, "count": count})
+    return pages
+
+
+def page_pixels(dpi: int) -> tuple:
+    """Width and height of a page in pixels."""
+    return tuple(round(size / 25.4 * dpi) for size in PAGE_SIZE_MM)
+
+
+def variant_path(word: str, size: int, cache_dir: Path, images_dir: Path) -> Path:
+    """A copy of the picture of a word no bigger than size x size, made if missing or older than
+    the source. Returns None if the word has no picture."""
+    source = images_dir / f"{word}.png"
+    if not source.is_file():
+        return None
+    variant = cache_dir / str(size) / f"{word}.png"
+    if variant.is_file() and variant.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+        return variant
+
+    reader = QImageReader(str(source))
+    source_size = reader.size()
+    if source_size.isValid():
+        # Let the decoder scale while reading when it can.
+        reader.setScaledSize(source_size.scaled(size, size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    variant.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and moved, as several workers may make the same variant.
+    handle, temporary = tempfile.mkstemp(suffix=".png", dir=variant.parent)
+    os.close(handle)
+    image.save(temporary, "PNG")
+    os.replace(temporary, variant)
+    return variant
+
+
+# Application object of the worker processes: Qt needs one to draw text.
+_worker_app = None
+
+
+def _init_worker():
+    """Create the application object of a worker, without a display."""
+    global _worker_app  # pylint: disable = global-statement
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    _worker_app = QGuiApplication.instance() or QGuiApplication([])
+
+
+def render_page(page: dict, dpi: int, cache_dir: str, images_dir: str) -> bytes:
+    """Draw a page. Returns it as a PNG file, much smaller than the raw image to send back."""
+    width, height = page_pixels(dpi)
+    margin = round(MARGIN_MM / 25.4 * dpi)
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+
+    # Title, and page number of the category at the bottom.
+    title_font = QFont()
+    title_font.setPixelSize(round(dpi * 0.25))
+    title_font.setBold(True)
+    painter.setFont(title_font)
+    title_height = round(dpi * 0.45)
+    painter.drawText(QRect(margin, margin, width - 2 * margin, title_height), Qt.AlignCenter,
+                     page["label"])
+    small_font = QFont()
+    small_font.setPixelSize(round(dpi * 0.1))
+    painter.setFont(small_font)
+    painter.drawText(QRect(margin, height - margin, width - 2 * margin, margin // 2),
+                     Qt.AlignCenter, f"{page['number']} / {page['count']}")
+
+    # One row per pair: two square cells with the picture, the word below.
+    word_font = QFont()
+    word_font.setPixelSize(round(dpi * 0.18))
+    caption_height = round(dpi * 0.3)
+    top = margin + title_height
+    row_height = (height - 2 * margin - title_height) // ROWS_PER_PAGE
+    gap = margin
+    cell = min(row_height - caption_height - gap // 2, (width - 2 * margin - gap) // 2)
+    left = (width - 2 * cell - gap) // 2
+    for row, pair in enumerate(page["pairs"]):
+        y = top + row * row_height
+        for column, word in enumerate(pair):
+            x = left + column * (cell + gap)
+            painter.setPen(QColor("#bbbbbb"))
+            painter.drawRect(x, y, cell, cell)
+            variant = variant_path(word, cell, Path(cache_dir), Path(images_dir))
+            if variant is not None:
+                picture = QImage(str(variant))
+                # Centered in its cell.
+                painter.drawImage(x + (cell - picture.width()) // 2,
+                                  y + (cell - picture.height()) // 2, picture)
+            painter.setPen(QColor("black"))
+            painter.setFont(word_font)
+            painter.drawText(QRect(x, y + cell, cell, caption_height), Qt.AlignCenter, word)
+    painter.end()
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(data)
+
+
+class PageWriter:
+    """Writes the rendered pages in order, to a PDF file or to numbered PNG files."""
+
+    def __init__(self, output: Path, file_format: str, dpi: int):
+        """Init."""
+        self.output = output
+        self.file_format = file_format
+        self.count = 0
+        self.writer = None
+        self.painter = None
+        if file_format == "pdf":
+            self.writer = QPdfWriter(str(output))
+            self.writer.setPageSize(QPageSize(QPageSize.A4))
+            self.writer.setPageMargins(QMarginsF(0, 0, 0, 0))
+            self.writer.setResolution(dpi)
+            self.writer.setTitle("Les Paires Minimales")
+        else:
+            output.mkdir(parents=True, exist_ok=True)
+
+    def write(self, page: dict, png: bytes):
+        """Add a page."""
+        if self.writer is not None:
+            if self.painter is None:
+                self.painter = QPainter(self.writer)
+            else:
+                self.writer.newPage()
+            image = QImage.fromData(png, "PNG")
+            self.painter.drawImage(QRect(0, 0, self.writer.width(), self.writer.height()), image)
+        else:
+            name = f"{self.count + 1:03d}_{page['title']}_{page['number']}.png"
+            (self.output / name).write_bytes(png)
+        self.count += 1
+
+    def close(self):
+        """Finish the file."""
+        if self.painter is not None:
+            self.painter.end()
+
+
+def export_worksheets(lists: dict, output: Path, file_format: str = "pdf", dpi: int = 150,
+                      cache_dir: Path = Path("cache") / "worksheet", workers: int = None,
+                      in_flight: int = None, progress=None, images_dir: Path = None) -> int:
+    """Render the worksheets of the lists ({title: pairs}) and write them to output, a PDF file
+    or a directory of PNG files. At most in_flight pages (twice the workers by default) are
+    rendered or waiting to be written at a time. progress(done, total) is called after each
+    page. Returns the number of pages.
+    The pictures are taken from images_dir, by default the images of the data package, found
+    like PathManager does (not next to this file, which is in the library archive once frozen)."""
+    pages = paginate(lists)
+    if not pages:
+        return 0
+    if images_dir is None:
+        images_dir = importlib.resources.files("data") / "images"
+    workers = min(workers or os.cpu_count() or 1, len(pages))
+    in_flight = in_flight or 2 * workers
+    writer = PageWriter(Path(output), file_format, dpi)
+    # Spawned, not forked: the workers must not inherit the Qt state of the application.
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+        remaining = iter(pages)
+        for page in remaining:
+            pending.append((page, executor.submit(render_page, page, dpi, str(cache_dir),
+                                                   str(images_dir))))
+            if len(pending) < in_flight:
+                continue
+            # Written in order: wait for the oldest page before submitting another one.
+            done_page, future = pending.popleft()
+            writer.write(done_page, future.result())
+            if progress is not None:
+                progress(writer.count, len(pages))
+        while pending:
+            done_page, future = pending.popleft()
+            writer.write(done_page, future.result())
+            if progress is not None:
+                progress(writer.count, len(pages))
+    writer.close()
+    return writer.count
+
+
+class WorksheetExport(QThread):
+    """Runs export_worksheets() in a thread, so that the window stays responsive while the pool
+    renders the pages. Emits progress(done, total) after each page; error is the message of the
+    failure, if any, once finished."""
+
+    progress = Signal(int, int)
+
+    def __init__(self, lists: dict, output: Path, cache_dir: Path, parent=None):
+        """Init."""
+        super().__init__(parent)
+        self.lists = lists
+        self.output = output
+        self.cache_dir = cache_dir
+        self.error = None
+
+    def run(self):
+        """Export, in the thread."""
+        try:
+            export_worksheets(self.lists, self.output, cache_dir=self.cache_dir,
+                              progress=self.progress.emit)
+        except Exception as error:  # pylint: disable = broad-exception-caught
+            self.error = str(error)
+
+
+def main(argv=None):
+    """Export worksheets from the command line."""
+    parser = argparse.ArgumentParser(description="Export printable worksheets.")
+    parser.add_argument("lists", nargs="*", help='categories or lists: "p_b", "fin_s"')
+    parser.add_argument("--all", action="store_true", help="every category and list of pairs.py")
+    parser.add_argument("--output", default="fiches.pdf",
+                        help="PDF file, or directory with --format png")
+    parser.add_argument("--format", choices=("pdf", "png"), default="pdf")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=str(Path("cache") / "worksheet"))
+    args = parser.parse_args(argv)
+
+    available = corpus_lists()
+    names = list(available) if args.all else args.lists
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        parser.error(f"unknown lists: {', '.join(unknown)}" if unknown
+                     else "give at least one category or list, or --all")
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])  # pylint: disable = W0612
+    count = export_worksheets({name: available[name] for name in names}, Path(args.output),
+                              args.format, args.dpi, Path(args.cache_dir), args.workers,
+                              progress=lambda done, total: print(f"\r{done}/{total} pages",
+                                                                 end="", flush=True))
+    print(f"\n{count} pages in {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())